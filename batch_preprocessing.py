@@ -0,0 +1,281 @@
+try:
+    import glob
+    import importlib
+    import inspect
+    import os
+    import time
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as import_err:
+    print(import_err)
+
+
+# Name of the partition column of the dataset
+SOURCE_COLUMN = "source_workbook"
+
+# Name of the per-file report in the dataset folder (files starting with '_' are skipped when the dataset is read)
+REPORT_FILE = "_timings.csv"
+
+# Folder of the dataset with the output files of every workbook (skipped when the dataset is read, like REPORT_FILE)
+WORKBOOKS_FOLDER = "_workbooks"
+
+
+def find_workbooks(input_path: str) -> list:
+    """
+    Lists the workbooks to process: the .xlsx files of a directory, or the files matching a glob pattern
+    (e.g. 'annotations/**/*.xlsx'). Excel lock files ('~$...') are skipped.
+
+    Parameters:
+        input_path (str): A directory or a glob pattern.
+
+    Returns:
+        list: The paths of the workbooks, sorted.
+    """
+    if os.path.isdir(input_path):
+        excel_files = glob.glob(os.path.join(input_path, "*.xlsx"))
+    else:
+        excel_files = glob.glob(input_path, recursive=True)
+    return sorted(excel_file for excel_file in excel_files
+                  if os.path.isfile(excel_file) and not os.path.basename(excel_file).startswith("~$"))
+
+
+def write_workbook_partition(output_df: pd.DataFrame, dataset_path: str) -> None:
+    """
+    Writes the output of one workbook as its partition of the Parquet dataset, replacing the partition
+    of a previous run (the other partitions are kept).
+
+    Parameters:
+        output_df (pd.DataFrame): The output of the workbook, with the SOURCE_COLUMN column.
+        dataset_path (str): The root folder of the dataset.
+    """
+    # Mixed object columns (e.g. texts read as numbers) are written as strings
+    object_columns = output_df.select_dtypes(include=["object"]).columns
+    output_df = output_df.astype({column: "string" for column in object_columns if column != SOURCE_COLUMN})
+
+    table = pa.Table.from_pandas(output_df, preserve_index=False)
+    pq.write_to_dataset(table, dataset_path, partition_cols=[SOURCE_COLUMN],
+                        existing_data_behavior="delete_matching", basename_template="part-{i}.parquet")
+
+
+def stage_seconds(stage_metrics) -> dict:
+    """
+    Returns the wall time of the top level stages of a run, as "<stage>_seconds" columns of the report
+    (a stage called more than once is summed).
+
+    Parameters:
+        stage_metrics (StageMetrics): The metrics of the run.
+
+    Returns:
+        dict: The seconds per stage, in the order the stages ended.
+    """
+    records_df = stage_metrics.to_dataframe()
+    if records_df.empty:
+        return {}
+    seconds = records_df[records_df["depth"] == 0].groupby("stage", sort=False)["wall_seconds"].sum()
+    return {f"{stage}_seconds": round(value, 3) for stage, value in seconds.items()}
+
+
+def process_workbook(excel_file: str,
+                     module_name: str,
+                     columns_to_drop: list,
+                     dataset_path: str,
+                     print_excel: bool = False,
+                     streaming_io: bool = False,
+                     n_workers_per_workbook: int = 1,
+                     output_formats: tuple = ("csv",),
+                     incremental: bool = False) -> dict:
+    """
+    Worker function of `process_workbooks`: runs the preprocessing of one workbook (the `process_excel_file`
+    of the module, as its `main` does) and writes its partition.
+
+    The preprocessing module is imported once per worker process and reused for all its workbooks. The output
+    files of the workbook (and the fingerprints of the incremental runs) are saved in the folder
+    '<dataset_path>/_workbooks/<file name>'. The options are passed only if the `process_excel_file` of the module
+    supports them (`preprocessing` always writes the output sheet and an 'output.csv').
+
+    Parameters:
+        excel_file (str): The path of the workbook.
+        module_name (str): The preprocessing module, "preprocessing_nov" or "preprocessing".
+        columns_to_drop (list): The columns to be dropped from the input sheet.
+        dataset_path (str): The root folder of the dataset.
+        print_excel (bool): Whether to write the output to a new sheet in the workbook.
+        streaming_io (bool): Whether to write the workbook once, row by row, with bounded memory.
+        n_workers_per_workbook (int): The number of processes used for the input rows of the workbook.
+        output_formats (tuple): The formats of the output files of the workbook: "csv", "parquet" and/or "arrow".
+        incremental (bool): Whether to process only the input rows changed since the previous run of the workbook.
+
+    Returns:
+        dict: The report of the workbook: status, error, number of output rows and seconds per stage.
+    """
+    source_workbook = os.path.basename(excel_file)
+    report = {SOURCE_COLUMN: source_workbook, "status": "ok", "error": None, "rows": 0}
+    start = time.perf_counter()
+    stage_metrics = None
+
+    try:
+        module = importlib.import_module(module_name)
+        output_path = os.path.join(dataset_path, WORKBOOKS_FOLDER, source_workbook)
+        os.makedirs(output_path, exist_ok=True)
+
+        options = {"print_excel": print_excel, "n_workers": n_workers_per_workbook, "streaming_io": streaming_io,
+                   "output_formats": output_formats, "incremental": incremental}
+        parameters = inspect.signature(module.process_excel_file).parameters
+        preprocessed_data = module.process_excel_file(
+            excel_file, columns_to_drop, output_path,
+            **{name: value for name, value in options.items() if name in parameters})
+        stage_metrics = preprocessed_data.stage_metrics
+
+        # The methods print their errors instead of raising them, so a failed run leaves no output
+        if preprocessed_data.filtered_df is None:
+            errors = [record["error"] for record in stage_metrics.records if record["error"]]
+            raise RuntimeError(errors[0] if errors else "reorder_and_filter did not produce an output")
+
+        output_df = preprocessed_data.filtered_df.assign(**{SOURCE_COLUMN: source_workbook})
+        frame = stage_metrics.start_stage("write_dataset", len(output_df))
+        try:
+            write_workbook_partition(output_df, dataset_path)
+        except Exception as error:
+            stage_metrics.end_stage(frame, None, error)
+            raise
+        stage_metrics.end_stage(frame, len(output_df))
+        report["rows"] = len(output_df)
+    except Exception as error:
+        report.update({"status": "error", "error": f"{type(error).__name__}: {error}"})
+
+    if stage_metrics is not None:
+        report.update(stage_seconds(stage_metrics))
+    report["total_seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def process_workbooks(input_path: str,
+                      dataset_path: str,
+                      module_name: str = "preprocessing_nov",
+                      columns_to_drop: list = None,
+                      n_workers: int = None,
+                      print_excel: bool = False,
+                      streaming_io: bool = False,
+                      n_workers_per_workbook: int = 1,
+                      output_formats: tuple = ("csv",),
+                      incremental: bool = False) -> pd.DataFrame:
+    """
+    Preprocesses many workbooks concurrently in one pool of processes and merges their outputs into one
+    Parquet dataset, partitioned by the SOURCE_COLUMN column (the file name of the workbook).
+
+    The worker processes are reused for many workbooks, so pandas / openpyxl are imported and warmed up
+    once per worker instead of once per file. Running the batch again replaces the partitions of the
+    processed workbooks only. A workbook that fails is reported and does not stop the batch.
+
+    Parameters:
+        input_path (str): A directory of .xlsx workbooks or a glob pattern.
+        dataset_path (str): The root folder of the Parquet dataset.
+        module_name (str): The preprocessing module, "preprocessing_nov" or "preprocessing".
+        columns_to_drop (list): The columns to be dropped from the input sheet of every workbook.
+        n_workers (int): The number of worker processes; the number of CPUs by default.
+        print_excel (bool): Whether to write the output to a new sheet in every workbook.
+        streaming_io (bool): Whether to write the workbooks row by row, with bounded memory.
+        n_workers_per_workbook (int): The number of processes used for the input rows of every workbook.
+        output_formats (tuple): The formats of the output files of every workbook: "csv", "parquet" and/or "arrow".
+        incremental (bool): Whether to process only the input rows changed since the previous run of every workbook.
+
+    Returns:
+        pd.DataFrame: The per-file report (status, error, rows and seconds per stage), also saved as
+                      REPORT_FILE in the dataset folder.
+    """
+    excel_files = find_workbooks(input_path)
+    if not excel_files:
+        raise FileNotFoundError(f"No workbooks found in '{input_path}'")
+
+    # The file name is the partition value, so it must identify the workbook
+    source_workbooks = [os.path.basename(excel_file) for excel_file in excel_files]
+    duplicates = sorted({name for name in source_workbooks if source_workbooks.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Workbooks with the same file name: {duplicates}")
+
+    os.makedirs(dataset_path, exist_ok=True)
+    n_workers = min(n_workers or os.cpu_count() or 1, len(excel_files))
+    print(f"Processing {len(excel_files)} workbooks with {n_workers} workers...")
+
+    start = time.perf_counter()
+    reports = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(process_workbook, excel_file, module_name, columns_to_drop or [], dataset_path,
+                                   print_excel, streaming_io, n_workers_per_workbook, output_formats, incremental)
+                   for excel_file in excel_files]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            print(f"[{len(reports)}/{len(excel_files)}] {report[SOURCE_COLUMN]}: {report['status']}, "
+                  f"{report['rows']} rows in {report['total_seconds']:.2f}s")
+
+    # Save the report in the order of the input files
+    report_df = pd.DataFrame(reports).set_index(SOURCE_COLUMN).loc[source_workbooks].reset_index()
+    report_df.to_csv(os.path.join(dataset_path, REPORT_FILE), sep=";", index=False)
+    print(f"Processed {len(excel_files)} workbooks in {time.perf_counter() - start:.2f}s "
+          f"({int((report_df['status'] != 'ok').sum())} failed).")
+    return report_df
+
+
+def read_dataset(dataset_path: str, source_workbooks: list = None) -> pd.DataFrame:
+    """
+    Reads the dataset written by `process_workbooks`, optionally only the partitions of some workbooks.
+
+    Parameters:
+        dataset_path (str): The root folder of the dataset.
+        source_workbooks (list): The file names of the workbooks to read, or None for all of them.
+
+    Returns:
+        pd.DataFrame: The outputs of the workbooks, with the SOURCE_COLUMN column.
+    """
+    filters = [(SOURCE_COLUMN, "in", source_workbooks)] if source_workbooks else None
+    return pq.read_table(dataset_path, filters=filters).to_pandas()
+
+
+def main(input_path: str, dataset_path: str, module_name: str = "preprocessing_nov", columns_to_drop: list = None,
+         n_workers: int = None, print_excel: bool = False, streaming_io: bool = False, n_workers_per_workbook: int = 1,
+         output_formats: tuple = ("csv",), incremental: bool = False) -> None:
+    """
+    Main function to preprocess a batch of workbooks into one partitioned dataset.
+
+    Parameters:
+    - input_path (str): A directory of .xlsx workbooks or a glob pattern.
+    - dataset_path (str): The root folder of the Parquet dataset (partitioned by 'source_workbook').
+    - module_name (str): The preprocessing module, "preprocessing_nov" or "preprocessing".
+    - columns_to_drop (list): The columns to be dropped from the input sheet of every workbook.
+    - n_workers (int): The number of worker processes (None: the number of CPUs).
+    - print_excel (bool): Whether to write the output to a new sheet in every workbook.
+    - streaming_io (bool): Whether to write the workbooks row by row, with bounded memory.
+    - n_workers_per_workbook (int): The number of processes used for the input rows of every workbook.
+    - output_formats (tuple): The formats of the output files of every workbook: "csv", "parquet" and/or "arrow".
+    - incremental (bool): Whether to process only the input rows changed since the previous run of every workbook.
+
+    Returns:
+    - None: The function writes the dataset and the per-file report, but does not return any value.
+    """
+    try:
+        report_df = process_workbooks(input_path, dataset_path, module_name, columns_to_drop, n_workers,
+                                      print_excel, streaming_io, n_workers_per_workbook, output_formats, incremental)
+        print(report_df.to_string(index=False))
+    except Exception as main_error:
+        print(main_error)
+
+
+if __name__ == '__main__':
+    try:
+        kwargs = {
+            "input_path": "workbooks",  # Set the directory (or glob pattern) of the workbooks
+            "dataset_path": "output_dataset",  # Set the folder of the partitioned Parquet dataset
+            "module_name": "preprocessing_nov",  # Set the preprocessing module: "preprocessing_nov" or "preprocessing"
+            "columns_to_drop": [],  # Set the columns to be dropped
+            "n_workers": None,  # Set the number of worker processes (None: the number of CPUs)
+            "print_excel": False,  # Set whether to print or not the output to a new sheet in every workbook
+            "streaming_io": False,  # Set whether to write the workbooks row by row, with bounded memory
+            "n_workers_per_workbook": 1,  # Set the number of processes used for the input rows of every workbook
+            "output_formats": ("csv",),  # Set the output file formats of every workbook: "csv", "parquet", "arrow"
+            "incremental": False,  # Set whether to process only the rows changed since the previous run
+        }
+        main(**kwargs)
+    except Exception as error:
+        print(error)
@@ -1,4 +1,8 @@
 import re
+from collections import Counter
+
+# Splits the address text into words, keeping the whitespace runs as separate pieces
+WORD_SPLIT_PATTERN = re.compile(r"(\s+)")
 
 
 def reorder_and_join(listA: list, listB: list, address_text: str) -> str:
@@ -17,23 +21,23 @@ def reorder_and_join(listA: list, listB: list, address_text: str) -> str:
         Exception: Prints the error if an unexpected issue occurs during processing.
     """
     try:
-        # Combine both lists into one for comparison with the address text
-        combined_list = listA + listB
+        # Count the elements of both lists (a multiset), so every element is matched at most as many times as it is given
+        remaining = Counter(listA + listB)
 
         # Initialize an empty list to hold sorted elements
         sorted_elements = []
 
-        # Split the address_text into words while preserving spaces using regex
-        for word in re.split(r"(\s+)", address_text):
+        # Split the address_text into words while preserving spaces using the precompiled pattern
+        for word in WORD_SPLIT_PATTERN.split(address_text):
             # Remove leading/trailing spaces from the word
             word = word.strip()
 
-            # Check if the word exists in the combined list
-            if word in combined_list:
+            # Check if the word is still available in the combined lists
+            if remaining[word] > 0:
                 # Add the word to the sorted elements list
                 sorted_elements.append(word)
-                # Remove the word from the combined list to avoid duplicates
-                combined_list.remove(word)
+                # Decrease its count to avoid duplicates
+                remaining[word] -= 1
 
         # Join the sorted elements into a single string with spaces
         return " ".join(sorted_elements)
@@ -42,6 +46,19 @@ def reorder_and_join(listA: list, listB: list, address_text: str) -> str:
         print(error)
 
 
+def reorder_and_join_batch(triples: list) -> list:
+    """
+    Applies reorder_and_join to many (listA, listB, address_text) triples.
+
+    Args:
+        triples (list): An iterable of (listA, listB, address_text) tuples.
+
+    Returns:
+        list: The reordered and joined string of every triple, in the same order.
+    """
+    return [reorder_and_join(listA, listB, address_text) for listA, listB, address_text in triples]
+
+
 if __name__ == "__main__":
     # Default values for standalone testing
     listA = ["Μουργκάνας", "Μαρούσι"]  # Example street names
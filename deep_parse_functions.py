@@ -1,32 +1,10 @@
 import numpy as np
-
-# Convert address to NGRAM
-def convert_word_to_ngram(word, ngram):
-  """
-  converts a word to ngrams
-  """
-  import numpy as np
-  
-  word_list = []
-
-  word_chars = list(word)
-  word_len = len(word_chars)
-
-  for i in np.arange(1, word_len, 1):
-    word_list.append(word_chars[i-1])
-    if i % ngram == 0:
-      word_list.append(" ")
-  word_list.append(word_chars[word_len-1])
-
-  return "".join((x) for x in word_list)
+from dl_functions import address_positional_features, convert_word_to_ngram, convert_words_to_ngrams, split_chars_batch
 
 # Standarize address 1
 # Strip accents and lowercase
-import unicodedata
-
-def strip_accents_and_lowercase(s):
-   return ''.join(c for c in unicodedata.normalize('NFD', str(s))
-                  if unicodedata.category(c) != 'Mn').lower()
+# (one normalization cache, shared with dl_functions, so normalization_cache_stats covers every entry point)
+from dl_functions import strip_accents_and_lowercase, normalization_cache_stats
 
 
 # Make function to split sentences into characters
@@ -62,16 +40,12 @@ def convert_address_to_model_input(address,
 
   # models: ngram
   if ngram_bool:
-    formated_address_list_ngram = []
-    for addr_element in address.split():
-      formated_address_list_ngram.append(convert_word_to_ngram(addr_element,3))
+    formated_address_list_ngram = convert_words_to_ngrams(address.split(), 3)
     formated_address = formated_address_list_ngram
 
   # models: char embed
   if char_bool:
-    formated_address_list_char = []
-    for element in formated_address:
-      formated_address_list_char.append(split_chars(element))
+    formated_address_list_char = split_chars_batch(formated_address)
     formated_address = formated_address_list_char
   
   # models: "model_conv1d_line_order"
@@ -80,16 +54,8 @@ def convert_address_to_model_input(address,
     import tensorflow as tf
     address_length = len(formated_address)
 
-    # create line_numbers one hot
-    line_numbers_indices = tf.range(0, address_length, 1)
-    line_numbers_depth = 10
-    line_numbers = tf.one_hot(line_numbers_indices, line_numbers_depth)
-
-    # create total_lines one hot
-    total_lines_indices = tf.fill([1, address_length], address_length-1)
-    total_lines_depth = 10
-    total_lines = tf.one_hot(total_lines_indices, total_lines_depth)
-    total_lines = tf.squeeze(total_lines)
+    # line_numbers and total_lines one hot, precomputed per address length (shared with dl_functions)
+    line_numbers, total_lines = address_positional_features(address_length, squeeze_total_lines=True)
 
     # create formated address
     formated_address = (line_numbers,
@@ -103,30 +69,9 @@ def convert_address_to_model_input(address,
   return formated_address
 
 def terra_geocode(addr):
-  import os
-  import requests
-  import json
-
-  url = "http://mapsrv5.terra.gr/avl/webservice.asmx/getAddressJSON"
-
-  data={}
-  # data['code'] = 'Age78em3xSOpTGLSV+Ukks5Jk+q87IKsYX6WLpKhWdfiN6cldyr2y5WS66HTwtlam5mmXA7RdFCBFJGyGgXSV4WncMeoekitmyyDeRinO10P2KK0TEWJOJAZfVgPZ69t/igyp7s0un2EA1e1TlrpfPCo8JBJbliuuqUmnHZIqDWW6HkRpe6mJhUbiPBhQLqSpRvKgEmBa1WOjJ+/uZdgNw=='
-  # data['machineID'] = 'XLS-4F1C8ECF-9EA2-45DA-A349-B6E06AEE3A2F'
-  data['countryCode'] = '30'
-  data['input'] = addr
-  data['SRID'] = '2100'
-
-  query_string = ''
-  for k, v in data.items():
-      query_string += k + '=' + v + '&'
-
-  url = url + '?'+ query_string[:-1]
-
-  session = requests.Session()
-  session.stream = True
-  resp = session.get(url=url)
-
-  address_list = json.loads(resp.text[76:-9])
-
-  return address_list
+  """
+  geocodes an address with the shared client of terra_client.py (keep-alive connection pool)
+  """
+  from terra_client import get_terra_client
 
+  return get_terra_client("http://mapsrv5.terra.gr/avl/webservice.asmx/getAddressJSON").geocode(addr)
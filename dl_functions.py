@@ -8,27 +8,49 @@ Original file is located at
 """
 
 # deep parse functions
+import re
 import numpy as np
+from functools import lru_cache
 
 # Convert address to NGRAM
 def convert_word_to_ngram(word, ngram):
   """
   converts a word to ngrams
+  (a space after every ngram chars, but not at the end of the word: 'αγιου' -> 'αγι ου', 'αγι' -> 'αγι')
   """
-  import numpy as np
-  
-  word_list = []
+  return " ".join([word[i:i + ngram] for i in range(0, len(word), ngram)])
 
-  word_chars = list(word)
-  word_len = len(word_chars)
+# Batch tokenizers
+# the words of a batch are joined with "\n" and converted to ngrams by a single regex pass
+# ('.' does not match "\n", so the pattern never crosses a word boundary)
+WORD_SEPARATOR = "\n"
 
-  for i in np.arange(1, word_len, 1):
-    word_list.append(word_chars[i-1])
-    if i % ngram == 0:
-      word_list.append(" ")
-  word_list.append(word_chars[word_len-1])
+@lru_cache(maxsize=None)
+def ngram_pattern(ngram):
+  """
+  compiled pattern matching every ngram chars followed by another char of the same word
+  """
+  return re.compile("(.{%d})(?=.)" % ngram)
 
-  return "".join((x) for x in word_list)
+def convert_words_to_ngrams(words, ngram):
+  """
+  converts a batch of words to ngrams (same output as convert_word_to_ngram for every word)
+  """
+  words = list(words)
+  if not words:
+    return []
+  joined_words = WORD_SEPARATOR.join(words)
+  if joined_words.count(WORD_SEPARATOR) != len(words) - 1:
+    # words with line breaks are converted one by one
+    return [convert_word_to_ngram(word, ngram) for word in words]
+  return ngram_pattern(ngram).sub(r"\1 ", joined_words).split(WORD_SEPARATOR)
+
+def split_chars_batch(texts):
+  """
+  splits a batch of texts into characters (same output as split_chars for every text)
+  """
+  # str.join iterates the characters directly (faster than a regex pass over the whole batch)
+  return [" ".join(text) for text in texts]
 
 # Make function to split sentences into characters
 def split_chars(text):
@@ -36,118 +58,260 @@ def split_chars(text):
 
 # Strip accents and lowercase
 import unicodedata
+import threading
+from collections import OrderedDict, Counter
+
+class CombiningMarksTable(dict):
+  """
+  str.translate table that deletes the combining marks (unicode category 'Mn')
+  the category of every code point is looked up once and kept in the table
+  """
+  def __missing__(self, code_point):
+    value = None if unicodedata.category(chr(code_point)) == 'Mn' else code_point
+    self[code_point] = value
+    return value
+
+COMBINING_MARKS_TABLE = CombiningMarksTable()
+
+class NormalizationCache:
+  """
+  bounded, thread-safe LRU cache of normalized texts, with hit / miss / eviction statistics
+  """
+  def __init__(self, function, maxsize=200000):
+    self.function = function
+    self.maxsize = maxsize
+    self.values = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def __call__(self, text):
+    with self.lock:
+      if text in self.values:
+        self.values.move_to_end(text)
+        self.hits += 1
+        return self.values[text]
+
+    # normalize outside the lock, so threads do not wait for each other
+    value = self.function(text)
+
+    with self.lock:
+      self.misses += 1
+      self.values[text] = value
+      if len(self.values) > self.maxsize:
+        self.values.popitem(last=False)
+        self.evictions += 1
+    return value
+
+  def stats(self):
+    """
+    returns the cache statistics as a dictionary
+    """
+    with self.lock:
+      lookups = self.hits + self.misses
+      return {"hits": self.hits,
+              "misses": self.misses,
+              "evictions": self.evictions,
+              "size": len(self.values),
+              "maxsize": self.maxsize,
+              "hit_rate": self.hits / lookups if lookups else 0.0}
+
+  def clear(self):
+    """
+    empties the cache and resets the statistics
+    """
+    with self.lock:
+      self.values.clear()
+      self.hits = self.misses = self.evictions = 0
+
+def normalize_uncached(s):
+  """
+  NFD, strip the combining marks (one str.translate) and lowercase
+  """
+  return unicodedata.normalize('NFD', s).translate(COMBINING_MARKS_TABLE).lower()
+
+NORMALIZATION_CACHE = NormalizationCache(normalize_uncached)
 
 def strip_accents_and_lowercase(s):
-   return ''.join(c for c in unicodedata.normalize('NFD', str(s))
-                  if unicodedata.category(c) != 'Mn').lower()
+  return NORMALIZATION_CACHE(s if isinstance(s, str) else str(s))
 
-def convert_address_to_model_input_2(address, model_name):
+def normalization_cache_stats():
+  """
+  hits, misses, evictions, size, maxsize and hit_rate of the strip_accents_and_lowercase cache
+  """
+  return NORMALIZATION_CACHE.stats()
 
+# Model input specs
+# Every model id is mapped to the layout of its input: a feature name, or a list / tuple of layouts.
+# Features: "split" (python list of tokens), "token", "ngram", "char", "line_numbers", "total_lines"
+MODEL_INPUT_SPECS = {}
+
+def register_model_input(model_names, layout):
   """
-  convert address to model input
-  ---------------------------------
-  The address is given as is (text).
-  The address is standarized by the function code using the strip_accents_and_lowercase function.
+  registers the input layout of one or more model ids
+  """
+  for model_name in model_names:
+    MODEL_INPUT_SPECS[model_name] = layout
+
+register_model_input(["model_0"], "split") # baseline model (OK)
+register_model_input(["model_100", "model_1"], "token") # token (OK)
+register_model_input(["model_100a", "model_1a"], "token") # token blstm (OK)
+register_model_input(["model_1030", "model_13"], ["ngram", "token"]) # conv1d (OK)
+register_model_input(["model_700", "model_7"], ["char", "ngram"]) # char n-gram (OK)
+register_model_input(["model_800", "model_8"], [("char", "ngram"), "token"]) # deep_parse_v1 (OK)
+register_model_input(["model_800a", "model_8a"], [("char", "ngram"), "token"]) # deep_parse_v2 (OK)
+register_model_input(["model_200", "model_2"], ("line_numbers", "total_lines", "token")) # conv1d_positional_embeddings (OK)
+register_model_input(["model_300", "model_3"], "ngram") # conv1d_ngram_embeddings (OK)
+register_model_input(["model_300a", "model_3a"], "char") # conv1d_ngram_embeddings (OK)
+register_model_input(["model_400", "model_4"], "ngram") # bilstm_ngram_embeddings (OK)
+register_model_input(["model_500"], ("token", "ngram")) # token_conv1d_and_bilstm_ngram_embeddings (OK)
+register_model_input(["model_600", "model_6"], ("line_numbers", "total_lines", "token", "char")) # token_char_and_pos_embeddings (OK)
+
+def layout_features(layout):
+  """
+  returns the set of feature names used in a layout
+  """
+  if isinstance(layout, (list, tuple)):
+    return set().union(*[layout_features(element) for element in layout])
+  return {layout}
+
+def pack_layout(layout, features):
+  """
+  packs the computed features into the structure of a layout
+  """
+  if isinstance(layout, (list, tuple)):
+    return type(layout)(pack_layout(element, features) for element in layout)
+  return features[layout]
+
+def positional_indices(row_lengths):
+  """
+  line_numbers and total_lines indices of every token of a batch of addresses
+  * line_numbers: position of the token inside its address
+  * total_lines:  address length - 1 (address length for single token addresses)
   """
+  token_lengths = np.repeat(row_lengths, row_lengths)
+  line_numbers_indices = np.arange(token_lengths.size) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+  total_lines_indices = np.where(token_lengths > 1, token_lengths - 1, token_lengths)
+  return line_numbers_indices, total_lines_indices
+
+# Precomputed one-hot rows of the positional features (depth 10)
+# the last row is all zeros, like tf.one_hot for indices out of the depth
+POSITIONAL_DEPTH = 10
+POSITIONAL_ONE_HOT = np.vstack([np.eye(POSITIONAL_DEPTH, dtype=np.float32),
+                                np.zeros((1, POSITIONAL_DEPTH), dtype=np.float32)])
+
+def positional_one_hot(indices):
+  """
+  one-hot encodes positional indices by slicing the precomputed table (same values as tf.one_hot(indices, 10))
+  """
+  return POSITIONAL_ONE_HOT[np.minimum(indices, POSITIONAL_DEPTH)]
 
+@lru_cache(maxsize=None)
+def address_positional_features(address_length, squeeze_total_lines=False):
+  """
+  cached (line_numbers, total_lines) tensors of a single address with address_length tokens
+  * default (model input specs): a single token address gets total_lines one_hot(1) with shape [1, 10]
+  * squeeze_total_lines (line order input of deep_parse_functions): total_lines is one_hot(address_length-1)
+    for every token, squeezed like tf.squeeze (shape [10] for a single token address)
+  """
   import tensorflow as tf
-  import unicodedata
 
-  address_standarize = strip_accents_and_lowercase(address)
-  address_split = address_standarize.split()
-  address_char = []
-  for element in address_split:
-    address_char.append(split_chars(element))
-  address_ngram = []
-  for element in address_split:
-    address_ngram.append(convert_word_to_ngram(element,3))
+  line_numbers_indices, total_lines_indices = positional_indices(np.array([address_length]))
+  if squeeze_total_lines:
+    total_lines_indices = np.full(address_length, address_length - 1)
+  total_lines = positional_one_hot(total_lines_indices)
+  if squeeze_total_lines and address_length == 1:
+    total_lines = total_lines[0]
+  return tf.constant(positional_one_hot(line_numbers_indices)), tf.constant(total_lines)
+
+def compute_features(address_tokens, row_lengths, feature_names):
+  """
+  computes only the requested features for the (concatenated) tokens of one or more addresses
+  """
+  import tensorflow as tf
+
+  features = {}
+  if "split" in feature_names:
+    features["split"] = address_tokens
+  if "token" in feature_names:
+    features["token"] = tf.constant(address_tokens, dtype=tf.string)
+  if "ngram" in feature_names:
+    features["ngram"] = tf.constant(convert_words_to_ngrams(address_tokens, 3), dtype=tf.string)
+  if "char" in feature_names:
+    features["char"] = tf.constant(split_chars_batch(address_tokens), dtype=tf.string)
+  if "line_numbers" in feature_names or "total_lines" in feature_names:
+    if len(row_lengths) == 1:
+      # single address: reuse the cached tensors of its length
+      features["line_numbers"], features["total_lines"] = address_positional_features(int(row_lengths[0]))
+    else:
+      line_numbers_indices, total_lines_indices = positional_indices(row_lengths)
+      features["line_numbers"] = tf.constant(positional_one_hot(line_numbers_indices))
+      features["total_lines"] = tf.constant(positional_one_hot(total_lines_indices))
+  return features
+
+def make_model_featurizers(layout):
+  """
+  builds the featurizer functions (single address and batch) of a layout
+  """
+  feature_names = layout_features(layout)
 
-  if model_name == "model_0": # baseline model (OK)
-    converted_address = address_split
+  def featurize(address):
+    address_split = strip_accents_and_lowercase(address).split()
+    features = compute_features(address_split, np.array([len(address_split)]), feature_names)
+    return pack_layout(layout, features)
 
-  if model_name == "model_100" or model_name == "model_1": # token (OK)
-    converted_address = tf.constant(address_split)
+  def featurize_batch(addresses):
+    address_splits = [strip_accents_and_lowercase(address).split() for address in addresses]
+    row_lengths = np.array([len(address_split) for address_split in address_splits], dtype=np.int64)
+    address_tokens = [token for address_split in address_splits for token in address_split]
+    features = compute_features(address_tokens, row_lengths, feature_names)
+    return pack_layout(layout, features), row_lengths
 
-  if model_name == "model_100a" or model_name == "model_1a": # token blstm (OK)
-    converted_address = tf.constant(address_split)
+  return featurize, featurize_batch
 
-  if model_name == "model_1030" or model_name == "model_13": # conv1d (OK)
-    converted_address = [tf.constant(address_ngram), tf.constant(address_split)]
+# featurizers of every registered model id, built once at import
+MODEL_FEATURIZERS = {model_name: make_model_featurizers(layout) for model_name, layout in MODEL_INPUT_SPECS.items()}
 
-  if model_name == "model_700" or model_name == "model_7": # char n-gram (OK)
-    converted_address = [tf.constant(address_char), tf.constant(address_ngram)]
+def get_model_featurizer(model_name, batch=False):
+  """
+  returns the precompiled featurizer of a model id
+  * batch=False: featurize(address) -> converted_address
+  * batch=True:  featurize_batch(addresses) -> (converted_addresses, row_lengths)
+  """
+  if model_name not in MODEL_FEATURIZERS:
+    raise ValueError(f"Unknown model_name: {model_name}")
+  return MODEL_FEATURIZERS[model_name][1 if batch else 0]
 
-  if model_name == "model_800" or model_name == "model_8": # deep_parse_v1 (OK)
-    converted_address = [(tf.constant(address_char), tf.constant(address_ngram)), tf.constant(address_split)]
+def convert_address_to_model_input_2(address, model_name):
 
-  if model_name == "model_800a" or model_name == "model_8a": # deep_parse_v2 (OK)
-    converted_address = [(tf.constant(address_char), tf.constant(address_ngram)), tf.constant(address_split)]
-	  
-  if model_name == "model_200" or model_name == "model_2": # conv1d_positional_embeddings (OK)
+  """
+  convert address to model input
+  ---------------------------------
+  The address is given as is (text).
+  The address is standarized by the function code using the strip_accents_and_lowercase function.
+  Only the features of model_name (see MODEL_INPUT_SPECS) are computed.
+  """
 
-    address_length = len(address_split)
+  return get_model_featurizer(model_name)(address)
 
-    # create line_numbers one hot
-    line_numbers_indices = tf.range(0, address_length, 1)
-    line_numbers_depth = 10
-    line_numbers = tf.one_hot(line_numbers_indices, line_numbers_depth)
+def convert_addresses_to_model_input_2(addresses, model_name):
 
-    # create total_lines one hot {8/7/2024}
-    if address_length > 1:
-      total_lines_indices = tf.fill([1, address_length], address_length-1)
-      total_lines_depth = 10
-      total_lines = tf.one_hot(total_lines_indices, total_lines_depth)
-      total_lines = tf.squeeze(total_lines)
-    else:
-      total_lines_indices = tf.fill([1, address_length], address_length)
-      total_lines_depth = 10
-      total_lines = tf.one_hot(total_lines_indices, total_lines_depth)
-      total_lines =tf.reshape(total_lines, [1, total_lines_depth])
-
-    # create formated address
-    converted_address = (line_numbers,
-        total_lines,
-        tf.constant(address_split))
-
-  if model_name == "model_300" or model_name == "model_3": # conv1d_ngram_embeddings (OK)
-    converted_address = tf.constant(address_ngram)
-
-  if model_name == "model_300a" or model_name == "model_3a": # conv1d_ngram_embeddings (OK)
-    converted_address = tf.constant(address_char)
-
-  if model_name == "model_400" or model_name == "model_4": # bilstm_ngram_embeddings (OK)
-    converted_address = tf.constant(address_ngram)
-
-  if model_name == "model_500": # token_conv1d_and_bilstm_ngram_embeddings (OK)
-    converted_address = (tf.constant(address_split), tf.constant(address_ngram))
-
-  if model_name == "model_600" or model_name == "model_6": # token_char_and_pos_embeddings (OK)
-    address_length = len(address_split)
-
-    line_numbers_indices = tf.range(0, address_length, 1)
-    line_numbers_depth = 10
-    line_numbers = tf.one_hot(line_numbers_indices, line_numbers_depth)
-    line_numbers
-
-    # create total_lines one hot {8/7/2024}
-    if address_length > 1:
-      total_lines_indices = tf.fill([1, address_length], address_length-1)
-      total_lines_depth = 10
-      total_lines = tf.one_hot(total_lines_indices, total_lines_depth)
-      total_lines = tf.squeeze(total_lines)
-    else:
-      total_lines_indices = tf.fill([1, address_length], address_length)
-      total_lines_depth = 10
-      total_lines = tf.one_hot(total_lines_indices, total_lines_depth)
-      total_lines =tf.reshape(total_lines, [1, total_lines_depth])
+  """
+  convert a batch of addresses to model input
+  ---------------------------------
+  The addresses are given as is (list or pandas Series of texts).
+  Only the representations that model_name consumes are computed, and the tokens
+  of all the addresses are concatenated, so the whole batch is scored with a
+  single model.predict call (the models classify every token of an address).
 
-    # create formated address
-    converted_address = (line_numbers,
-		total_lines,
-		tf.constant(address_split),
-		tf.constant(address_char))
+  returns:
+   * converted_addresses: model input with the same structure as convert_address_to_model_input_2
+   * row_lengths:         number of tokens of every address, to split the predictions back per address
+                          e.g. np.split(pred_probs, np.cumsum(row_lengths)[:-1])
+  """
 
-  return converted_address
+  return get_model_featurizer(model_name, batch=True)(addresses)
 
 def display_pred_probs_text(text, pred_probs, class_names):
   """
@@ -216,27 +380,109 @@ def display_pred_probs_list(class_names,
 
   return pred_dict
 
+def decode_pred_probs_batch(class_names,
+                            address_splits,
+                            pred_probs,
+                            score = 0):
+
+  """
+  batch version of display_pred_probs_list
+  ---------------------------------
+  parameters:
+   * class_names:    list of class_names
+   * address_splits: list of address_split token lists (one per address)
+   * pred_probs:     pred_probs array of shape (n_addresses, n_tokens, n_classes), padded after the tokens of
+                     every address, or the (total tokens, n_classes) predictions of convert_addresses_to_model_input_2
+   * score:          tokens with prediction probability (%) <= score are left out
+
+  returns a pandas DataFrame, one row per address, with a column per class (the tokens of the class)
+  and a <class>_score column per class (the probabilities of the tokens), e.g.
+     street        street_score  number  number_score ...
+     μελισιων      99.12         18      97.5
+
+  the values are the ones of display_pred_probs_list, joined by ' ' (without the leading ' ' / 'None'),
+  and '' for the classes without tokens.
+  argmax, probabilities and thresholding are computed for all the tokens at once.
+  """
+
+  import pandas as pd
+
+  pred_probs = np.asarray(pred_probs)
+  n_addresses = len(address_splits)
+  n_classes = len(class_names)
+
+  # flatten the predictions of the tokens (drop the padding of a 3-D array)
+  row_lengths = np.array([len(address_split) for address_split in address_splits], dtype=np.int64)
+  if pred_probs.ndim == 3:
+    row_lengths = np.minimum(row_lengths, pred_probs.shape[1])
+    token_mask = np.arange(pred_probs.shape[1]) < row_lengths[:, None]
+    token_probs = pred_probs[:n_addresses][token_mask]
+  else:
+    token_probs = pred_probs[:row_lengths.sum()]
+  tokens = [token for address_split, row_length in zip(address_splits, row_lengths) for token in address_split[:row_length]]
+
+  # label, probability and threshold of every token
+  pred_indices = token_probs.argmax(axis=1)
+  pred_prob = np.round(token_probs[np.arange(len(pred_indices)), pred_indices] * 100, 2)
+  keep = pred_prob > score
+
+  token_address = np.repeat(np.arange(n_addresses), row_lengths)[keep]
+  token_class = pred_indices[keep]
+  token_text = pd.Series(tokens, dtype=object)[keep].str.replace(" ", "", regex=False).to_numpy(dtype=object)
+  token_score = pred_prob[keep].astype(str).astype(object)
+
+  # sort the tokens by (address, class), keeping the token order, and join every group with np.add.reduceat
+  order = np.lexsort((token_class, token_address))
+  token_address, token_class = token_address[order], token_class[order]
+  group_start = np.flatnonzero(np.r_[True, (np.diff(token_address) != 0) | (np.diff(token_class) != 0)])[:len(order)]
+  separator = np.full(len(order), " ", dtype=object)
+  separator[group_start] = ""
+
+  decoded_tokens = np.full((n_addresses, n_classes), "", dtype=object)
+  decoded_scores = np.full((n_addresses, n_classes), "", dtype=object)
+  if len(order):
+    group_cells = (token_address[group_start], token_class[group_start])
+    decoded_tokens[group_cells] = np.add.reduceat(separator + token_text[order], group_start)
+    decoded_scores[group_cells] = np.add.reduceat(separator + token_score[order], group_start)
+
+  columns = {}
+  for class_index, class_name in enumerate(class_names):
+    columns[class_name] = decoded_tokens[:, class_index]
+    columns[class_name + "_score"] = decoded_scores[:, class_index]
+  return pd.DataFrame(columns)
+
+# splits the address into words, keeping the whitespace runs as separate pieces
+WORD_SPLIT_PATTERN = re.compile(r"(\s+)")
+
 def reorder_and_join(streetNames, streetNumbers, reordered_address):
 
   # streetNames = ["Μελισίων", "Μουργκάνας", "Μαρούσι"]
   # streetNumbers = ["&", "18", "1"]
-  
-  import re
+
   try:
-    combined_list = streetNames + streetNumbers
+    # multiset of the elements: every element is matched at most as many times as it is given
+    remaining = Counter(streetNames + streetNumbers)
 
     sorted_elements = []
 
-    for word in re.split(r"(\s+)", reordered_address):
+    for word in WORD_SPLIT_PATTERN.split(reordered_address):
       word = word.strip()
-      if word in combined_list:
+      if remaining[word] > 0:
         sorted_elements.append(word)
-        combined_list.remove(word)
+        remaining[word] -= 1
 
     return " ".join(sorted_elements)
   except Exception as error:
     print(error)
 
+def reorder_and_join_batch(triples):
+  """
+  reorder_and_join for many (streetNames, streetNumbers, reordered_address) triples
+  returns the list of the results, in the same order
+  """
+  return [reorder_and_join(streetNames, streetNumbers, reordered_address)
+          for streetNames, streetNumbers, reordered_address in triples]
+
 def terra_geocoding_service(addr):
 
   """
@@ -252,39 +498,12 @@ def terra_geocoding_service(addr):
   'addPoint': {'x': 302124.0, 'y': 4235460.0},
   'addPointWGS84': None,
   'addFormated': 'Καραϊσκάκη Γεωργίου  32 &lt;b&gt;Πάτρα&lt;/b&gt; 26221'}]
-  """
-  
-
-  
-  import os
-  import requests
-  import json
-
-  data={}
-  url = "http://mapsrv9.terra.gr/avl/webservice.asmx/getAddressJSON"
-
-
-  addr = addr.replace('&', '%26')
-
-  data['countryCode'] = '30'
-  data['input'] = addr
-  data['SRID'] = '2100'
-
-  query_string = ''
-  for k, v in data.items():
-      query_string += k + '=' + v + '&'
-
-  url = url + '?'+ query_string[:-1]
-  # print(url)
-
-  session = requests.Session()
-  session.stream = True
-  resp = session.get(url=url)
-
-  address_list = json.loads(resp.text[76:-9])
-
-  return address_list
-
 
+  the requests go through the shared client of terra_client.py
+  (keep-alive connection pool, optional on-disk response cache with the TERRA_CACHE_PATH environment variable)
+  for many addresses use get_terra_client().geocode_many(addresses, concurrency)
+  """
 
+  from terra_client import get_terra_client
 
+  return get_terra_client("http://mapsrv9.terra.gr/avl/webservice.asmx/getAddressJSON").geocode(addr)
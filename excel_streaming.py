@@ -0,0 +1,298 @@
+try:
+    import itertools
+    import os
+    import tempfile
+    from collections import defaultdict
+    import numpy as np
+    import pandas as pd
+    import openpyxl as opyxl
+    from openpyxl.cell.cell import ERROR_CODES
+    from openpyxl.utils.dataframe import dataframe_to_rows
+except ImportError as import_err:
+    print(import_err)
+
+
+def convert_cell_value(value):
+    """
+    Converts the value of a cell as `pd.read_excel` does: empty cells become "", error cells (e.g. '#N/A')
+    become NaN and integral numbers become integers.
+
+    Parameters:
+        value: The value of the cell, as given by openpyxl.
+
+    Returns:
+        The converted value.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# The strings read as missing values by `pd.read_excel` (its default `na_values`)
+DEFAULT_NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                     "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+def iter_sheet_rows(sheet):
+    """
+    Yields the converted values (see `convert_cell_value`) of the rows of a read-only sheet, without their
+    trailing empty cells. Empty rows are yielded only when a row with data follows them, so the trailing empty
+    rows of the sheet are dropped.
+    """
+    empty_rows = 0
+    for row in sheet.iter_rows(values_only=True):
+        values = [convert_cell_value(value) for value in row]
+        while values and values[-1] == "":
+            values.pop()
+        if not values:
+            empty_rows += 1
+            continue
+        for _ in range(empty_rows):
+            yield []
+        empty_rows = 0
+        yield values
+
+
+def make_column_names(header_row: list) -> list:
+    """
+    Names the columns as `pd.read_excel` does: an empty header becomes 'Unnamed: N' and repeated headers
+    get '.1', '.2', ... suffixes (skipping the suffixed names that are headers themselves). The named columns
+    are numbered before the unnamed ones.
+    """
+    names = [f"Unnamed: {position}" if value == "" else value for position, value in enumerate(header_row)]
+    unnamed_positions = [position for position, value in enumerate(header_row) if value == ""]
+    named_positions = [position for position, value in enumerate(header_row) if value != ""]
+
+    counts = defaultdict(int)
+    for position in named_positions + unnamed_positions:
+        name = original_name = names[position]
+        count = counts[name]
+        while count > 0:
+            counts[original_name] = count + 1
+            name = f"{original_name}.{count}"
+            count = count + 1 if name in names else counts[name]
+        names[position] = name
+        counts[name] = count + 1
+    return names
+
+
+def convert_missing_values(values: np.ndarray, dtype=None) -> np.ndarray:
+    """
+    Replaces the missing values of a column (see DEFAULT_NA_VALUES) with NaN, as `pd.read_excel` does,
+    and converts the other values to strings if `dtype` is str.
+    """
+    missing = pd.isna(values) | np.array([isinstance(value, str) and value in DEFAULT_NA_VALUES
+                                          for value in values], dtype=bool)
+    values = values.copy()
+    values[missing] = np.nan
+    if dtype is str:
+        values[~missing] = [str(value) for value in values[~missing]]
+    return values
+
+
+def infer_column_type(values: np.ndarray) -> np.ndarray:
+    """
+    Converts a column (after `convert_missing_values`) to numbers or booleans if all its values are,
+    as `pd.read_excel` does; otherwise the values are kept as they are.
+    """
+    # A column without rows keeps the object dtype
+    if not len(values):
+        return values
+
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        pass
+
+    # Booleans (and the strings 'True' / 'False'), with NaN for the missing values
+    booleans = {True: True, False: False, "True": True, "TRUE": True, "true": True,
+                "False": False, "FALSE": False, "false": False}
+    missing = pd.isna(values)
+    present = values[~missing]
+    if len(present) and all(isinstance(value, (bool, str)) and value in booleans for value in present):
+        values = values.copy()
+        values[~missing] = [booleans[value] for value in present]
+        return values if missing.any() else values.astype(bool)
+    return values
+
+
+def read_sheet_streaming(excel_file: str, sheet_name: str, dtype=None, chunk_size: int = 10000) -> pd.DataFrame:
+    """
+    Reads a sheet of an Excel file into a DataFrame, with the first row as the header.
+
+    The workbook is opened in read-only mode and the sheet is read row by row (only the cell values),
+    so the workbook itself is never loaded in memory. The result is the same as
+    `pd.read_excel(excel_file, sheet_name=sheet_name, header=0, dtype=dtype)`: trailing empty cells and rows
+    are dropped, missing headers become 'Unnamed: N' and repeated headers get '.1', '.2', ... suffixes.
+
+    Memory: the rows are read `chunk_size` at a time, and the missing values (and the text of a `dtype=str`
+    column) of every chunk are converted before the next chunk is read, so at most one chunk of Python row lists
+    and of the original cell values is alive. The result then holds the values of the whole sheet once; joining
+    the chunks and typing the columns (`dtype=None`) copy only the 8-byte references to them, column by column.
+
+    Parameters:
+        excel_file (str): The path of the Excel file.
+        sheet_name (str): The name of the sheet.
+        dtype: str to read all the cells as text, or None to infer the types of the columns.
+        chunk_size (int): The number of rows collected at a time.
+
+    Returns:
+        pd.DataFrame: The rows of the sheet.
+    """
+    workbook = opyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook[sheet_name]
+        # The dimensions stored in the file may be wrong, so the rows are read until the end of the sheet
+        sheet.reset_dimensions()
+
+        rows = iter_sheet_rows(sheet)
+        header_row = next(rows, None)
+        if header_row is None:
+            return pd.DataFrame()
+
+        chunks = []
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            # Object columns keep the cell values as they are (e.g. integers next to missing values); the types of
+            # the columns are inferred once all the rows are read
+            chunk_df = pd.DataFrame(chunk, dtype=object)
+            del chunk
+            chunks.append(pd.DataFrame({position: convert_missing_values(chunk_df[position].to_numpy(), dtype)
+                                        for position in chunk_df.columns}, index=chunk_df.index, dtype=object))
+    finally:
+        workbook.close()
+
+    # The columns are the widest of the header and the data rows; the shorter rows are padded with missing values
+    data_df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(dtype=object)
+    del chunks
+    width = max(len(header_row), len(data_df.columns))
+    if len(data_df.columns) < width:
+        data_df = data_df.reindex(columns=range(width))
+    column_names = make_column_names(header_row + [""] * (width - len(header_row)))
+
+    sheet_df = pd.DataFrame({position: infer_column_type(data_df[position].to_numpy(dtype=object))
+                             if dtype is None else data_df[position].to_numpy(dtype=object)
+                             for position in range(width)})
+    sheet_df.columns = column_names
+    return sheet_df
+
+
+def find_column_position(header_row: list, column_name: str) -> int:
+    """
+    Finds the 0-based position of a column in a header row, ignoring the letter case.
+
+    Parameters:
+        header_row (list): The values of the header row.
+        column_name (str): The name of the column to find.
+
+    Returns:
+        int: The position of the column, or -1 if the column is not in the header row.
+    """
+    header_lower = [str(value).lower() if value is not None else None for value in header_row]
+    return header_lower.index(column_name.lower()) if column_name.lower() in header_lower else -1
+
+
+def write_workbook_streaming(excel_file: str,
+                             input_sheet: str = None,
+                             new_column: str = None,
+                             new_column_values: pd.Series = None,
+                             after_column: str = None,
+                             output_sheet: str = None,
+                             output_df: pd.DataFrame = None) -> None:
+    """
+    Rewrites an Excel file row by row, adding a column to the input sheet and/or replacing the output sheet.
+
+    The existing workbook is opened in read-only mode and copied into a new write-only workbook, so that only
+    one row is held in memory at a time, whatever the size of the workbook. The new workbook is saved to a
+    temporary file next to the original one, which is then replaced in a single step.
+
+    - If `new_column` is given, it is inserted in `input_sheet` right after `after_column`, with the header
+      `new_column` and the values of `new_column_values`. If the column already exists it is replaced in place.
+    - If `output_df` is given, `output_sheet` is removed (if present) and written again as the last sheet.
+
+    Note that only the cell values are copied; cell styles, merged cells and charts are not kept.
+
+    Parameters:
+        excel_file (str): The path of the Excel file.
+        input_sheet (str): The name of the sheet that receives the new column.
+        new_column (str): The header of the new column (e.g. 'rest').
+        new_column_values (pd.Series): The values of the new column, in the order of the sheet's data rows.
+        after_column (str): The header of the column after which the new column is inserted (e.g. 'full_address').
+        output_sheet (str): The name of the sheet to be replaced by `output_df`.
+        output_df (pd.DataFrame): The DataFrame written in `output_sheet`, without its index.
+
+    Returns:
+        None: The method rewrites the Excel file but does not return any value.
+    """
+    try:
+        # Open the existing workbook for reading only and create a new workbook for writing only
+        source_workbook = opyxl.load_workbook(excel_file, read_only=True)
+        target_workbook = opyxl.Workbook(write_only=True)
+
+        # Missing values of the new column are written as empty cells
+        if new_column_values is not None:
+            new_column_values = [None if pd.isna(value) else value for value in new_column_values]
+
+        for sheet_name in source_workbook.sheetnames:
+            # The output sheet is written again at the end
+            if output_df is not None and sheet_name == output_sheet:
+                continue
+
+            source_sheet = source_workbook[sheet_name]
+            target_sheet = target_workbook.create_sheet(sheet_name)
+
+            if new_column is None or sheet_name != input_sheet:
+                # Copy the sheet as is
+                for row in source_sheet.iter_rows(values_only=True):
+                    target_sheet.append(row)
+                continue
+
+            rows = source_sheet.iter_rows(values_only=True)
+            header_row = list(next(rows, ()))
+
+            # Replace the existing column in place, or insert it after the given column
+            replace_position = find_column_position(header_row, new_column)
+            if replace_position >= 0:
+                insert_position = replace_position
+                header_row.pop(replace_position)
+            else:
+                insert_position = find_column_position(header_row, after_column) + 1
+
+            header_row.insert(insert_position, new_column)
+            target_sheet.append(header_row)
+
+            # Write the data rows with the value of the new column
+            for row_number, row in enumerate(rows):
+                row = list(row)
+                if replace_position >= 0 and replace_position < len(row):
+                    row.pop(replace_position)
+                row += [None] * (insert_position - len(row))
+                row.insert(insert_position, new_column_values[row_number] if row_number < len(new_column_values) else None)
+                target_sheet.append(row)
+
+        # Write the output sheet as the last sheet of the workbook
+        if output_df is not None:
+            target_sheet = target_workbook.create_sheet(output_sheet)
+            for row in dataframe_to_rows(output_df, index=False, header=True):
+                target_sheet.append(row)
+
+        source_workbook.close()
+
+        # Save to a temporary file in the same folder and replace the original file in one step
+        file_descriptor, temporary_file = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(excel_file)))
+        os.close(file_descriptor)
+        try:
+            target_workbook.save(temporary_file)
+            os.replace(temporary_file, excel_file)
+        finally:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+    except Exception as error:
+        # Print any error encountered during execution
+        print(error)
@@ -1,9 +1,12 @@
 try:
     import os
+    import numpy as np
     import pandas as pd
     import openpyxl as opyxl
     from openpyxl.utils.dataframe import dataframe_to_rows
     import re
+    from excel_streaming import read_sheet_streaming, write_workbook_streaming
+    from stage_metrics import StageMetrics, instrumented_stage
 except ImportError as import_err:
     print(import_err)
 
@@ -13,9 +16,27 @@ pd.options.mode.copy_on_write = True
 
 
 class PreprocessingDataClass:
-    def __init__(self, excel_file: str, columns_to_drop: list[str], output_csv_path: str):
+    # Rules that classify the exploded address tokens: (target, pattern) pairs, tried in order,
+    # where the first pattern that fully matches a token sets its target (see `classify_address_tokens`)
+    address_token_rules = [
+        # Street numbers (a number, or a number with minor non-numeric content like spaces or hyphens)
+        ("streetNumber", r"\d+[-\s]*\d*"),
+    ]
+
+    # Target of the tokens that match no rule
+    address_token_default = "streetName"
+
+    # Corrected 'target' categories per layout of distinct 'target' values (see `correct_target`), shared by the
+    # instances of the process, so workbooks of the same template reuse them
+    target_correction_cache = {}
+
+    def __init__(self, excel_file: str, columns_to_drop: list[str], output_csv_path: str, streaming_io: bool = False):
         self.excel_file = excel_file
-        self.excel_df = pd.read_excel(self.excel_file, sheet_name='input', header=0)
+        # Write the output sheet row by row instead of loading the whole workbook
+        self.streaming_io = streaming_io
+        # Wall time, peak memory and rows of every stage (see `stage_metrics.StageMetrics`)
+        self.stage_metrics = StageMetrics()
+        self.excel_df = self.read_input_sheet()
         self.columns_to_drop = columns_to_drop
         self.output_csv_path = output_csv_path
         self.filtered_df = None
@@ -67,6 +88,17 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    @instrumented_stage()
+    def read_input_sheet(self) -> pd.DataFrame:
+        """
+        Reads the 'input' sheet of the Excel file row by row from the read-only workbook.
+
+        Returns:
+            pd.DataFrame: The input sheet.
+        """
+        return read_sheet_streaming(self.excel_file, 'input')
+
+    @instrumented_stage("excel_df")
     def drop_columns(self) -> None:
         """
         Drops specific columns from the DataFrame based on tags or a list of columns to drop.
@@ -100,7 +132,9 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage()
     def transform_address(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Transforms the address column in the DataFrame by removing specific substrings found in other columns.
@@ -119,12 +153,6 @@ class PreprocessingDataClass:
             # Define a new column that will store the modified address
             new_address = "address_to_explode"
 
-            # Define a temporary column to hold combined substrings to be removed from the address
-            substrings_combined = "substrings_combined"
-
-            # Copy the original address to the new address column
-            df[new_address] = df[address_column]
-
             # Define a tuple of substring column names that need to be removed from the address
             exclude_substrings_column_tuple = (
                 "po_box",
@@ -137,43 +165,38 @@ class PreprocessingDataClass:
                 "klm"
             )
 
-            # Iterate over each substring column in the tuple
+            # Find the columns of every substring group once (the columns whose name contains the group name)
+            # and take their values; a group without matching columns has nothing to remove and is skipped
+            substring_groups = []
             for substring_column in exclude_substrings_column_tuple:
-                # Find columns in df that match the current substring column name
                 matching_columns = [col for col in df.columns if substring_column in col]
-
-                # If matching columns are found, combine their values into a single string per row
                 if matching_columns:
-                    df[substrings_combined] = df[matching_columns].apply(
-                        lambda row: " ".join(row.dropna().astype(str).str.strip()), axis=1
-                    )
+                    group_values = df[matching_columns].to_numpy()
+                    substring_groups.append((group_values, pd.notna(group_values)))
 
-                # Define a function to remove substrings from the address column
-                def remove_substrings_from_address(row):
-                    # Get the address from the new address column
-                    address = row[new_address]
-
-                    # Get the combined substrings to remove
-                    substr_to_remove = row[substrings_combined]
+            # Remove the substrings of all the groups from every address in a single pass over the rows
+            new_addresses = []
+            for row_position, address in enumerate(df[address_column].to_numpy(dtype=object)):
+                for group_values, group_notna in substring_groups:
+                    # Combine the non-missing values of the group into a single string
+                    substr_to_remove = " ".join([str(value).strip() for value, notna in
+                                                 zip(group_values[row_position], group_notna[row_position]) if notna])
 
                     # If the substring to remove is valid and exists in the address, remove it
                     if pd.notna(substr_to_remove) and substr_to_remove in address:
                         address = address.replace(substr_to_remove, '').strip()
 
-                    # Return the cleaned address
-                    return address
-
-                # Apply the remove_substrings_from_address function to each row in the DataFrame
-                df[new_address] = df.apply(remove_substrings_from_address, axis=1)
+                new_addresses.append(address)
 
-            # Drop the temporary substrings_combined column as it's no longer needed
-            df = df.drop(substrings_combined, axis=1)
+            # Store the modified address in the new address column
+            df[new_address] = new_addresses
 
             # Return the transformed DataFrame
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
     def break_address(self, address: str) -> list[str]:
         """
@@ -195,6 +218,66 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    @instrumented_stage()
+    def melt_and_tokenize(self, df: pd.DataFrame, values_to_filter: list, text_dtype=None) -> pd.DataFrame:
+        """
+        Reshapes the wide DataFrame straight into the long table of (old_index, target, text) rows, with the
+        "address_to_explode" column already broken into its tokens.
+
+        The result has the same rows, in the same order, as stacking the DataFrame, filtering out
+        `values_to_filter` and exploding the address (`explode_address`), without building the intermediate
+        long frames: the missing cells are skipped, every other cell gives one row and every address gives one
+        row per token (or one row with a missing text if it has no tokens).
+
+        Parameters:
+            df (pd.DataFrame): The wide DataFrame, one row per input row ('old_index') and one column per target.
+            values_to_filter (list): The targets (columns) left out of the long table.
+            text_dtype: The dtype of the 'text' column (e.g. "string[pyarrow]"), or None to keep the cell values.
+
+        Returns:
+            pd.DataFrame: The long DataFrame with the columns 'old_index', 'target' and 'text'.
+        """
+        try:
+            # Step 1: Take the values of the columns that are kept
+            columns = [column for column in df.columns if column not in values_to_filter]
+            values = df[columns].to_numpy(dtype=object)
+
+            # Step 2: Find the non-missing cells row by row (the order of `stack`)
+            row_positions, column_positions = np.nonzero(pd.notna(values))
+            texts = values[row_positions, column_positions]
+            targets = np.asarray(columns, dtype=object)[column_positions]
+
+            # Step 3: Break the addresses into tokens; an address without tokens keeps one missing text
+            is_address = targets == "address_to_explode"
+            address_tokens = [self.break_address(address) or [np.nan] for address in texts[is_address]]
+
+            # Step 4: Every cell gives one row, every address one row per token
+            counts = np.ones(len(texts), dtype=np.int64)
+            counts[is_address] = [len(tokens) for tokens in address_tokens]
+            starts = np.cumsum(counts) - counts
+
+            long_texts = np.empty(counts.sum(), dtype=object)
+            long_texts[starts[~is_address]] = texts[~is_address]
+            address_counts = counts[is_address]
+            token_offsets = np.arange(address_counts.sum()) - np.repeat(np.cumsum(address_counts) - address_counts, address_counts)
+            long_texts[np.repeat(starts[is_address], address_counts) + token_offsets] = np.array(
+                [token for tokens in address_tokens for token in tokens], dtype=object)
+
+            # Step 5: Build the long DataFrame
+            long_df = pd.DataFrame({
+                "old_index": np.repeat(df.index.to_numpy()[row_positions], counts),
+                "target": np.repeat(targets, counts),
+                "text": long_texts,
+            })
+            if text_dtype is not None:
+                long_df["text"] = long_df["text"].astype(text_dtype)
+            return long_df
+        except Exception as error:
+            # Print and handle any error that occurs
+            print(error)
+            self.stage_metrics.record_error(error)
+
+    @instrumented_stage()
     def explode_address(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Splits address strings in the DataFrame into individual components and expands them into separate rows.
@@ -216,7 +299,50 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print and handle any error that occurs
             print(error)
+            self.stage_metrics.record_error(error)
 
+    def classify_address_tokens(self, texts: pd.Series, rules: list = None) -> pd.Series:
+        """
+        Classifies address tokens with a table of rules. Every rule is a (target, pattern) pair; the rules are
+        tried in order and the first pattern that fully matches a text sets its target. Texts that match no rule
+        get `address_token_default`.
+
+        E.g. postcodes can be told apart from street numbers with the rules
+        [("zip", r"\d{3} ?\d{2}"), ("streetNumber", ...)].
+
+        Parameters:
+            texts (pd.Series): The address tokens.
+            rules (list): The (target, pattern) rules; `address_token_rules` by default.
+
+        Returns:
+            pd.Series: The target of every token, with the index of `texts`.
+        """
+        try:
+            rules = self.address_token_rules if rules is None else rules
+
+            # The patterns use the `re` syntax, so the tokens are matched as Python strings
+            texts = texts.astype(object)
+
+            # Step 1: Every token starts with the default target
+            targets = pd.Series(self.address_token_default, index=texts.index, dtype=object)
+            unassigned = pd.Series(True, index=texts.index)
+
+            # Step 2: Apply the rules in order, each one only to the tokens that are still unassigned
+            for target, pattern in rules:
+                remaining_texts = texts[unassigned]
+                if remaining_texts.empty:
+                    break
+                matched = remaining_texts.str.fullmatch(pattern, na=False)
+                matched_index = remaining_texts.index[matched.to_numpy()]
+                targets.loc[matched_index] = target
+                unassigned.loc[matched_index] = False
+
+            return targets
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    @instrumented_stage()
     def rename_address_rows(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Renames the 'target' column in the DataFrame based on the content of the 'text' column,
@@ -228,30 +354,33 @@ class PreprocessingDataClass:
 
         Returns:
             pd.DataFrame: The DataFrame with updated 'target' values for rows where the 'target' was "address_to_explode".
+
+        Note:
+            The tokens are classified by `classify_address_tokens` with the rules of `address_token_rules`.
         """
         try:
             # Reset the DataFrame's index and drop the old index column
             df = df.reset_index().drop(columns=["index"])
             df.fillna(value={"text": " "}, inplace=True)
 
-            # Iterate over each row in the DataFrame
-            for idx, row in df.iterrows():
-                # Check if the 'target' column is "address_to_explode"
-                if row["target"] == "address_to_explode":
-                    # Check if 'text' is a number or contains minor non-numeric content like spaces or hyphens
-                    if re.fullmatch(r"\d+[-\s]*\d*", row["text"]):
-                        # If the text matches a street number pattern, set 'target' to "streetNumber"
-                        df.at[idx, "target"] = "streetNumber"
-                    else:
-                        # Otherwise, set 'target' to "streetName"
-                        df.at[idx, "target"] = "streetName"
+            # Classify the exploded address tokens with the rule table, one vectorized pass per rule
+            address_rows = df["target"] == "address_to_explode"
+            token_targets = self.classify_address_tokens(df.loc[address_rows, "text"])
+
+            # A categorical 'target' column needs the new targets among its categories
+            if isinstance(df["target"].dtype, pd.CategoricalDtype):
+                new_categories = [target for target in pd.unique(token_targets) if target not in df["target"].cat.categories]
+                df["target"] = df["target"].cat.add_categories(new_categories)
+            df.loc[address_rows, "target"] = token_targets
 
             # Return the modified DataFrame
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage("excel_df", "filtered_df")
     def reorder_and_filter(self) -> None:
         """
         Reorders the columns of the DataFrame, transforms the address column, filters specific rows,
@@ -274,25 +403,9 @@ class PreprocessingDataClass:
             # Rename the address column from "Διεύθυνση" to "address"
             self.excel_df = self.excel_df.rename(columns={"Διεύθυνση": "address"})
 
-            # Stack the DataFrame columns into indexes to reshape the DataFrame
-            # TODO: Consider using pd.melt() instead of pd.stack() for this operation
-            stacked_df = self.excel_df.stack()
-            reset_stacked_df = stacked_df.reset_index()
-
-            # Rename columns to reflect their new roles after stacking
-            # TODO: Ensure the column names are not hard-coded
-            reset_stacked_df = reset_stacked_df.rename(
-                columns={"level_0": "old_index", "level_1": "target", 0: "text"},
-                errors="raise"
-            )
-
-            # Filter out rows where "target" has specific unwanted values
-            column_to_filter = "target"
-            values_to_filter = ["data_street", "data_number"]
-            self.filtered_df = reset_stacked_df[~reset_stacked_df[column_to_filter].isin(values_to_filter)]
-
-            # Explode the "text" column, expanding list-like elements into separate rows
-            self.filtered_df = self.explode_address(self.filtered_df)
+            # Reshape the DataFrame into the long (old_index, target, text) table in one pass, filtering out
+            # unwanted targets and breaking the address into tokens (instead of stack, filter and explode)
+            self.filtered_df = self.melt_and_tokenize(self.excel_df, ["data_street", "data_number"])
             # self.filtered_df.drop(self.filtered_df[self.filtered_df["target"] == "Διεύθυνση"].index, inplace=True)
 
             # Merge the DataFrame with a count of total lines for each address
@@ -316,6 +429,7 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print and handle any error that occurs
             print(error)
+            self.stage_metrics.record_error(error)
 
     def generate_replacement_map(self, df: pd.DataFrame) -> dict:
         """
@@ -358,6 +472,7 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    @instrumented_stage()
     def correct_target(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Corrects the values in the 'target' column of a DataFrame by standardizing them.
@@ -372,22 +487,40 @@ class PreprocessingDataClass:
             This function standardizes values in the 'target' column by removing suffixes
             (e.g., 'streetName.1' becomes 'streetName'). It checks against a replacement map
             generated from the DataFrame to ensure that correct values are retained.
+            Only the distinct values are standardized, and the 'target' column becomes categorical.
         """
         try:
-            # Generate a replacement map for the 'target' column
-            replacements = self.generate_replacement_map(df)
-
-            # Correct the 'target' column by standardizing values
-            df["target"] = df["target"].apply(
-                lambda target_value: target_value.split('.')[0] if target_value not in replacements else target_value
-            )
+            # Step 1: Encode the 'target' column as codes of its distinct values, in order of appearance
+            codes, distinct_targets = pd.factorize(df["target"])
+            target_layout = tuple(distinct_targets)
+
+            # Step 2: Correct the distinct values once per layout of distinct values (i.e. per header layout);
+            # the same layout reuses the cached categories and the code of every distinct value
+            if target_layout not in self.target_correction_cache:
+                # Generate a replacement map for the distinct 'target' values
+                replacements = self.generate_replacement_map(pd.DataFrame({"target": distinct_targets}))
+
+                # Standardize the distinct values
+                corrected_targets = [target_value.split('.')[0] if target_value not in replacements else target_value
+                                     for target_value in distinct_targets]
+                categories = list(dict.fromkeys(corrected_targets))
+                category_codes = np.array([categories.index(target_value) for target_value in corrected_targets],
+                                          dtype=np.int64)
+                self.target_correction_cache[target_layout] = (categories, category_codes)
+            categories, category_codes = self.target_correction_cache[target_layout]
+
+            # Step 3: Map the codes back through a categorical 'target' column (missing values keep code -1)
+            df["target"] = pd.Categorical.from_codes(np.where(codes >= 0, category_codes[codes], -1),
+                                                     categories=categories)
 
             # Return the DataFrame with corrected 'target' values
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage("filtered_df")
     def write_in_excel(self) -> None:
         """
         Writes the filtered DataFrame to a new sheet in the existing Excel file and also saves it as a CSV file.
@@ -402,26 +535,32 @@ class PreprocessingDataClass:
             This function adds a new sheet named "output" to the existing Excel file, removes the sheet if it already exists,
             and saves the filtered DataFrame to this sheet. Additionally, it exports the DataFrame to a CSV file.
         """
-        # Load the existing Excel workbook
-        workbook = opyxl.load_workbook(filename=self.excel_file)
-
         # Define the name of the sheet to be created
         sheet_name = "output"
 
-        # Check if the "output" sheet already exists in the workbook and delete it if present
-        if sheet_name in workbook.sheetnames:
-            del workbook[sheet_name]
-
-        # Create a new sheet in the workbook with the name "output"
-        ws = workbook.create_sheet(sheet_name)
-
-        # Write the filtered DataFrame to the new Excel sheet, excluding the "old_index" column
-        for row in dataframe_to_rows(self.filtered_df.loc[:, self.filtered_df.columns != "old_index"],
-                                     index=False, header=True):
-            ws.append(row)
-
-        # Save the changes to the Excel file
-        workbook.save(self.excel_file)
+        if self.streaming_io:
+            # Copy the workbook row by row, replacing the "output" sheet, excluding the "old_index" column
+            write_workbook_streaming(self.excel_file,
+                                     output_sheet=sheet_name,
+                                     output_df=self.filtered_df.loc[:, self.filtered_df.columns != "old_index"])
+        else:
+            # Load the existing Excel workbook
+            workbook = opyxl.load_workbook(filename=self.excel_file)
+
+            # Check if the "output" sheet already exists in the workbook and delete it if present
+            if sheet_name in workbook.sheetnames:
+                del workbook[sheet_name]
+
+            # Create a new sheet in the workbook with the name "output"
+            ws = workbook.create_sheet(sheet_name)
+
+            # Write the filtered DataFrame to the new Excel sheet, excluding the "old_index" column
+            for row in dataframe_to_rows(self.filtered_df.loc[:, self.filtered_df.columns != "old_index"],
+                                         index=False, header=True):
+                ws.append(row)
+
+            # Save the changes to the Excel file
+            workbook.save(self.excel_file)
         print(f"Saved in new tab 'output' within '{self.excel_file}'.")
 
         # Define the path for the output CSV file
@@ -432,7 +571,42 @@ class PreprocessingDataClass:
         print(f"Saved in CSV file 'output.csv' in {output_csv_path}.")
 
 
-def main(excel_file: str, columns_to_drop: list, output_csv_path: str) -> None:
+def process_excel_file(excel_file: str, columns_to_drop: list, output_csv_path: str,
+                       streaming_io: bool = False) -> PreprocessingDataClass:
+    """
+    Runs the stages of the preprocessing of an Excel file: reads and filters its input rows, and writes the output
+    to a new sheet in the Excel file and a CSV file. Used by `main` and by the batch driver (`batch_preprocessing`).
+
+    Parameters:
+    - excel_file (str): The path to the Excel file to process.
+    - columns_to_drop (list): A list of column names to be dropped from the Excel file.
+    - output_csv_path (str): The directory path where the output CSV file will be saved.
+    - streaming_io (bool): Whether to write the Excel file row by row, with bounded memory.
+
+    Returns:
+    - PreprocessingDataClass: The processed data, with the output in `filtered_df` and the metrics of the stages
+                              in `stage_metrics`.
+    """
+    # Print a message indicating the start of processing
+    print(f"Processing for '{excel_file}'...")
+
+    # Create an instance of the PreprocessingDataClass with the provided Excel file, columns to drop, and output path
+    preprocessed_data = PreprocessingDataClass(excel_file, columns_to_drop, output_csv_path,
+                                               streaming_io=streaming_io)
+
+    # Call the method to drop specified columns
+    preprocessed_data.drop_columns()
+
+    # Call the method to reorder and filter the DataFrame
+    preprocessed_data.reorder_and_filter()
+
+    # Call the method to write the processed DataFrame to a new sheet in the Excel file and save as a CSV
+    preprocessed_data.write_in_excel()
+    return preprocessed_data
+
+
+def main(excel_file: str, columns_to_drop: list, output_csv_path: str, streaming_io: bool = False,
+         metrics_file: str = None, trace_file: str = None) -> None:
     """
     Main function to process Excel data, correct values in the "target" column,
     and output the updated data to a new tab in the same Excel file and a CSV file.
@@ -441,29 +615,26 @@ def main(excel_file: str, columns_to_drop: list, output_csv_path: str) -> None:
     - excel_file (str): The path to the Excel file to process.
     - columns_to_drop (list): A list of column names to be dropped from the Excel file.
     - output_csv_path (str): The directory path where the output CSV file will be saved.
+    - streaming_io (bool): Whether to write the Excel file row by row, with bounded memory.
+    - metrics_file (str): The path of a JSON file for the wall time, peak memory and rows of every stage, or None.
+    - trace_file (str): The path of a Chrome trace (chrome://tracing, Perfetto) of the stages, or None.
 
     Returns:
     - None: The function processes the data and writes the results to files, but does not return any value.
     """
     try:
-        # Print a message indicating the start of processing
-        print(f"Processing for '{excel_file}'...")
-
         # Optional: Change the directory to the raw data directory (commented out)
         # os.chdir(r"../../data/raw")
         # excel_file = "input_output_template - Copy.xlsx"
 
-        # Create an instance of the PreprocessingDataClass with the provided Excel file, columns to drop, and output path
-        preprocessed_data = PreprocessingDataClass(excel_file, columns_to_drop, output_csv_path)
-
-        # Call the method to drop specified columns
-        preprocessed_data.drop_columns()
-
-        # Call the method to reorder and filter the DataFrame
-        preprocessed_data.reorder_and_filter()
+        # Run the stages of the preprocessing
+        preprocessed_data = process_excel_file(excel_file, columns_to_drop, output_csv_path, streaming_io)
 
-        # Call the method to write the processed DataFrame to a new sheet in the Excel file and save as a CSV
-        preprocessed_data.write_in_excel()
+        # Export the metrics of the stages
+        if metrics_file:
+            preprocessed_data.stage_metrics.to_json(metrics_file)
+        if trace_file:
+            preprocessed_data.stage_metrics.to_chrome_trace(trace_file)
     except Exception as main_error:
         # Print any error encountered during the execution of the main function
         print(main_error)
@@ -474,7 +645,10 @@ if __name__ == '__main__':
         kwargs = {
             "excel_file": "input_output_template - Copy.xlsx",  # Set the Excel file with the input data
             "columns_to_drop": [],  # Set the columns to be dropped
-            "output_csv_path": r"..."  # Set the path for where 'output.csv' will be saved
+            "output_csv_path": r"...",  # Set the path for where 'output.csv' will be saved
+            "streaming_io": False,  # Set whether to write the Excel file row by row, with bounded memory
+            "metrics_file": None,  # Set the JSON file of the stage metrics (None: not saved)
+            "trace_file": None,  # Set the Chrome trace file of the stages (None: not saved)
         }
         main(**kwargs)
     except Exception as error:
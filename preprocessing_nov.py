@@ -1,26 +1,90 @@
 try:
     import os
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
     import pandas as pd
+    from pandas.api.types import union_categoricals
     import openpyxl as opyxl
     from openpyxl.utils.dataframe import dataframe_to_rows
     import re
+    from excel_streaming import read_sheet_streaming, write_workbook_streaming
+    from stage_metrics import StageMetrics, instrumented_stage
 except ImportError as import_err:
     print(import_err)
 
+# pyarrow is only needed for the Parquet / Arrow IPC outputs and the compact 'text' column
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError as import_err:
+    TEXT_DTYPE = "string"
+    print(import_err)
+
 # Set pandas options
 pd.set_option("display.max_columns", None)
 pd.options.mode.copy_on_write = True
 
 
 class PreprocessingDataClass:
-    def __init__(self, excel_file: str, columns_to_drop: list[str], output_csv_path: str):
+    # Regex pattern of the components of an address, compiled once when the class is loaded
+    # The pattern matches:
+    #   - Quoted words (e.g., '"word"')
+    #   - Words with hyphens (e.g., 'word-word')
+    #   - Words with periods (e.g., 'word.word.')
+    #   - Regular words
+    #   - Non-word characters (excluding spaces)
+    address_component_pattern = re.compile(
+        r'" ?\b\w+ ?"(?!\s)|\' ?\b\w+ ?\'(?!\s)|\b\w\.\b|\b\w+\.\b|\(\w+(?:[\'`]\w+)?\b|\b\w+\)|\b\w+(?:[\'`]\w+)?\-\w+|\w+(?:[\'`]\w+)?\.(?=\s)|\w+\.\w+\.?|\w+(?:[\'`]\w+)?\/\w+|\w+(?:[\'`]\w+)?|[^\w\s]',
+        re.UNICODE)
+
+    # Components dropped from an indexed address (commas, periods and quotes)
+    address_punctuation = frozenset([",", ".", "\"", "\'", "`"])
+
+    # Rules that classify the exploded address tokens: (target, pattern) pairs, tried in order,
+    # where the first pattern that fully matches a token sets its target (see `classify_address_tokens`)
+    address_token_rules = [
+        # Street numbers (a number, or a number with minor non-numeric content like spaces or hyphens)
+        ("streetNumber", r"\d+(?:-\d+)?(?:[Α-ΩA-Za-z](?:'\s*[\dΑ-ΩA-Za-z]*)*)?|\d+(?!ης)[α-ωΑ-Ω]+(?:[-\s]*\d+[α-ωΑ-ΩA-Za-z]*)*"),
+    ]
+
+    # Target of the tokens that match no rule
+    address_token_default = "streetName"
+
+    # Dtypes of the long-format output table ('filtered_df'), enforced from `melt_and_tokenize` onward:
+    # 'target' is categorical, 'old_index' and the line columns are small integers and the texts are Arrow strings
+    output_dtypes = {
+        "old_index": "int32",
+        "AA": TEXT_DTYPE,
+        "target": "category",
+        "text": TEXT_DTYPE,
+        "line_number": "int16",
+        "total_lines": "int16",
+    }
+
+    # Corrected 'target' categories per layout of distinct 'target' values (see `correct_target`), shared by the
+    # instances of the process, so workbooks of the same template reuse them
+    target_correction_cache = {}
+
+    def __init__(self, excel_file: str, columns_to_drop: list[str], output_csv_path: str,
+                 excel_df: pd.DataFrame = None, streaming_io: bool = False):
         self.excel_file = excel_file
         self.input_sheet = "input"
         self.output_sheet = "output"
-        self.excel_df = pd.read_excel(self.excel_file,
-                                      sheet_name=self.input_sheet,
-                                      header=0,
-                                      dtype=str)
+        # Fingerprints of the input rows of the last output, kept next to it for the incremental runs
+        self.fingerprints_file = "output_fingerprints.json"
+        self.fingerprint_columns = None
+        # Wall time, peak memory and rows of every stage (see `stage_metrics.StageMetrics`)
+        self.stage_metrics = StageMetrics()
+        # Write the Excel file once, row by row, instead of loading the whole workbook in each write
+        self.streaming_io = streaming_io
+        self.rest_data = None
+        # Use the given rows (e.g. a shard of the input sheet) instead of reading the Excel file
+        if excel_df is not None:
+            self.excel_df = excel_df
+        else:
+            self.excel_df = self.read_input_sheet()
         self.columns_to_drop = columns_to_drop
         self.output_csv_path = output_csv_path
         self.filtered_df = None
@@ -90,6 +154,17 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    @instrumented_stage()
+    def read_input_sheet(self) -> pd.DataFrame:
+        """
+        Reads the input sheet of the Excel file, as text, row by row from the read-only workbook.
+
+        Returns:
+            pd.DataFrame: The input sheet.
+        """
+        return read_sheet_streaming(self.excel_file, self.input_sheet, dtype=str)
+
+    @instrumented_stage("excel_df")
     def drop_columns(self) -> None:
         """
         Drops specific columns from the DataFrame based on tags or a list of columns to drop.
@@ -123,6 +198,7 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
     def remove_quotes(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -149,6 +225,44 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    def remove_row_values(self, df: pd.DataFrame, text_column: str, value_columns: list[str]) -> pd.Series:
+        """
+        Removes from the text of each row every value found in the given columns of the same row.
+
+        The values are removed one after the other, in the order of `value_columns`, and missing values are skipped,
+        exactly as calling `str.replace(value, '')` once per column. All the columns are read once as arrays and
+        every row is processed in a single pass, instead of one `DataFrame.apply` per column.
+
+        Parameters:
+            df (pd.DataFrame): The DataFrame containing the text column and the value columns.
+            text_column (str): The name of the column with the text to be cleaned (e.g. 'full_address').
+            value_columns (list[str]): The names of the columns whose values are removed from the text.
+
+        Returns:
+            pd.Series: The cleaned text, with the same index as `df`. Rows with a missing text stay missing.
+        """
+        try:
+            # Read the text and the values once, and find the non-missing values in one vectorized call
+            texts = df[text_column].to_numpy(dtype=object)
+            values = df[value_columns].to_numpy(dtype=object)
+            values_notna = pd.notna(values)
+
+            cleaned_texts = []
+            for text, row_values, row_values_notna in zip(texts, values.tolist(), values_notna.tolist()):
+                # Remove the values of the row from its text, skipping the missing ones
+                if isinstance(text, str):
+                    for value, value_notna in zip(row_values, row_values_notna):
+                        if value_notna:
+                            text = text.replace(str(value), '')
+                cleaned_texts.append(text)
+
+            # Return the cleaned text aligned with the input rows
+            return pd.Series(cleaned_texts, index=df.index, dtype=object)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    @instrumented_stage("excel_df")
     def build_rest(self) -> None:
         """
         This method constructs a 'rest' column in the DataFrame, based on the values of an address-related column.
@@ -193,17 +307,14 @@ class PreprocessingDataClass:
             # This handles cases where columns may have suffixes like ".1", ".2", etc.
             columns_to_merge_num = [column for column in self.excel_df if column.split(".")[0] in columns_to_merge]
 
-            # Initialize the 'rest' column with the values from the main address column
-            # This creates a copy of the address column to manipulate later
-            self.excel_df[rest_column] = self.excel_df.apply(lambda x: x[self.address_name], axis=1)
+            # Build the 'rest' column from the main address column, removing the values of the relevant columns
+            # of each row in a single pass, in the order of `columns_to_merge_num`
+            self.excel_df[rest_column] = self.remove_row_values(self.excel_df, self.address_name, columns_to_merge_num)
 
-            # Iterate over each relevant column and remove its value from the 'rest' column
-            for column in columns_to_merge_num:
-                # Check each cell, and if the value of the current column is found in the 'rest' column, remove it
-                # Use `pd.notna(x[column])` to ensure non-null values are processed
-                self.excel_df[rest_column] = self.excel_df.apply(
-                    lambda x: x[rest_column].replace(str(x[column]), '') if pd.notna(x[column]) else x[rest_column], axis=1
-                )
+            # In streaming mode the 'rest' column is kept and written together with the output by `write_in_excel_streaming`
+            if self.streaming_io:
+                self.rest_data = self.excel_df[rest_column]
+                return
 
             # Extract the newly created 'rest' column data for writing back to the Excel sheet
             new_column_data = self.excel_df[rest_column]
@@ -238,7 +349,9 @@ class PreprocessingDataClass:
         except Exception as main_error:
             # Print any error encountered during the execution of the method
             print(main_error)
+            self.stage_metrics.record_error(main_error)
 
+    @instrumented_stage()
     def add_line_numbers(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Adds a new column 'line_number' to the dataframe where it assigns
@@ -261,34 +374,21 @@ class PreprocessingDataClass:
                 "AA", "Street", "Num", "City", "Zip", "Type"
             ]
 
-            # Step 2: Initialize an empty list to store calculated line numbers
-            line_numbers = []
+            # Step 2: Break all the addresses into components at once (the first 'full_address' row of every 'old_index')
+            address_rows = df[df["target"] == "full_address"].drop_duplicates("old_index")
+            token_table = self.tokenize_addresses(address_rows.set_index("old_index")["text"])
 
-            # Step 3: Group the dataframe by 'old_index' and iterate through each group
-            for old_index, group in df.groupby("old_index"):
+            # Step 3: Keep the last position of a repeated component, as in `break_and_index_address`
+            token_table = token_table.drop_duplicates(["old_index", "token"], keep="last")
 
-                # Step 4: Get the row where 'target' is 'full_address' to extract the address components
-                address_row = group[group["target"] == "full_address"]
+            # Step 4: Look up the position of every row's text in the components of its address
+            # (a left merge keeps the rows and their order; texts that are not components get 0)
+            merged = df[["old_index", "text"]].merge(token_table, how="left",
+                                                      left_on=["old_index", "text"], right_on=["old_index", "token"])
+            line_numbers = merged["position"].fillna(0).astype(self.output_dtypes["line_number"]).to_numpy(copy=True)
 
-                # If there is a non-empty address row, break and index the address into components
-                if not address_row.empty:
-                    address = address_row["text"].values[0]
-
-                    # Call method to break the address into components and index them
-                    address_components = self.break_and_index_address(address)
-                else:
-                    # If no address is found, set address_components as an empty dictionary
-                    address_components = {}
-
-                # Step 5: Iterate over each row in the group
-                for _, row in group.iterrows():
-                    # If 'target' is in exclude_list, set line number to 0
-                    if row["target"] in exclude_list:
-                        line_numbers.append(0)
-                    else:
-                        # Otherwise, assign line number based on the address components
-                        line_number = address_components.get(row["text"], 0)
-                        line_numbers.append(line_number)
+            # Step 5: Targets in exclude_list get line number 0
+            line_numbers[df["target"].isin(exclude_list).to_numpy()] = 0
 
             # Step 6: Assign the generated line numbers to the 'line_number' column in the dataframe
             df["line_number"] = line_numbers
@@ -298,7 +398,9 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print any error encountered during the execution of the method
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage()
     def transform_address(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Transforms the address column in the DataFrame by removing specific substrings found in other columns.
@@ -317,12 +419,6 @@ class PreprocessingDataClass:
             # Define a new column that will store the modified address
             new_address = "address_to_explode"
 
-            # Define a temporary column to hold combined substrings to be removed from the address
-            substrings_combined = "substrings_combined"
-
-            # Copy the original address to the new address column
-            df[new_address] = df[address_column]
-
             # Define a tuple of substring column names that need to be removed from the address
             exclude_substrings_column_tuple = (
                 "neighborhood",
@@ -345,46 +441,42 @@ class PreprocessingDataClass:
                 "drop",
             )
 
-            # Iterate over each substring column in the tuple
+            # Step 1: Find the columns of every substring group once (the columns whose name contains the group name)
+            # and take their values; groups without matching columns are skipped
+            substring_groups = []
             for substring_column in exclude_substrings_column_tuple:
-                # Find columns in df that match the current substring column name
                 matching_columns = [col for col in df.columns if substring_column in col]
-
-                # If matching columns are found, combine their values into a single string per row
                 if matching_columns:
-                    df[substrings_combined] = df[matching_columns].apply(
-                        lambda row: " ".join(row.dropna().astype(str).str.strip()), axis=1
-                    )
-                else:
-                    df[substrings_combined] = ''
-                    continue
-
-                # Define a function to remove substrings from the address column
-                def remove_substrings_from_address(row):
-                    # Get the address from the new address column
-                    address = row[new_address].replace('\"', '')
-
-                    # Get the combined substrings to remove
-                    substr_to_remove = row[substrings_combined]
-
-                    # If the substring to remove is valid and exists in the address, remove it
-                    if pd.notna(substr_to_remove) and substr_to_remove in address:
+                    group_values = df[matching_columns].to_numpy()
+                    substring_groups.append((group_values, pd.notna(group_values)))
+
+            # Step 2: Remove the substrings of all the groups from every address in a single pass over the rows,
+            # group by group in the order of the tuple
+            new_addresses = []
+            for row_position, address in enumerate(df[address_column].to_numpy(dtype=object)):
+                for group_values, group_notna in substring_groups:
+                    # Remove the double quotes from the address
+                    address = address.replace('\"', '')
+
+                    # Combine the non-missing values of the group into a single string
+                    substr_to_remove = " ".join([str(value).strip() for value, notna in
+                                                 zip(group_values[row_position], group_notna[row_position]) if notna])
+
+                    # If the substring to remove exists in the address, remove it
+                    if substr_to_remove in address:
                         address = address.replace(substr_to_remove, '').strip()
 
-                    # Return the cleaned address
-                    return address
-
-                # Apply the remove_substrings_from_address function to each row in the DataFrame
-                df[new_address] = df.apply(remove_substrings_from_address, axis=1)
+                new_addresses.append(address)
 
-            # Drop the temporary substrings_combined column as it's no longer needed
-            df = df.drop(substrings_combined, axis=1)
+            # Store the modified address in the new address column
+            df[new_address] = new_addresses
 
             # Return the transformed DataFrame
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
     def break_address(self, address: str) -> list[str]:
         """
@@ -419,22 +511,14 @@ class PreprocessingDataClass:
             dict: A dictionary where keys are the substrings and values are their indices.
         """
         try:
-            # Step 1: Define a regex pattern to match different parts of the address
-            # The pattern matches:
-            #   - Words with hyphens (e.g., 'word-word')
-            #   - Words with periods (e.g., 'word.word.')
-            #   - Regular words
-            #   - Non-word characters (excluding spaces)
+            # Step 1: Extract the components from the address with the precompiled pattern (see `address_component_pattern`)
             # pattern = r"\b\w\.\b|\b\w+\.\b|\(\w+(?:['`]\w+)?\b|\b\w+\)|\b\w+(?:['`]\w+)?\-\w+|\w+(?:['`]\w+)?\.(?=\s)|\w+\.\w+\.?|\w+(?:['`]\w+)?\/\w+|\w+(?:['`]\w+)?|[^\w\s]"
-            pattern = r'" ?\b\w+ ?"(?!\s)|\' ?\b\w+ ?\'(?!\s)|\b\w\.\b|\b\w+\.\b|\(\w+(?:[\'`]\w+)?\b|\b\w+\)|\b\w+(?:[\'`]\w+)?\-\w+|\w+(?:[\'`]\w+)?\.(?=\s)|\w+\.\w+\.?|\w+(?:[\'`]\w+)?\/\w+|\w+(?:[\'`]\w+)?|[^\w\s]'
+            components = self.address_component_pattern.findall(address)
 
-            # Step 2: Use re.findall to extract components from the address based on the regex pattern
-            components = re.findall(pattern, address, re.UNICODE)
+            # Step 2: Filter out unwanted characters like commas, periods, and double quotes
+            components = [component for component in components if component not in self.address_punctuation]
 
-            # Step 3: Filter out unwanted characters like commas, periods, and double quotes
-            components = [component for component in components if component not in [",", ".", "\"", "\'", "`"]]
-
-            # Step 4: Assign an index to each unique component starting from 1
+            # Step 3: Assign an index to each unique component starting from 1
             indexed_components = {component: idx for idx, component in enumerate(components, 1)}
 
             # Return the dictionary containing substrings as keys and their indices as values
@@ -443,6 +527,104 @@ class PreprocessingDataClass:
             # Print any error encountered during the execution of the method
             print(error)
 
+    def tokenize_addresses(self, addresses: pd.Series) -> pd.DataFrame:
+        """
+        Batch version of `break_and_index_address`: breaks all the addresses of a Series into components at once
+        and returns them as a flat token table.
+
+        Parameters:
+            addresses (pd.Series): The addresses, indexed by their 'old_index'.
+
+        Returns:
+            pd.DataFrame: A DataFrame with the columns 'old_index', 'token' and 'position', one row per component,
+                          in the order of the addresses and of the components. 'position' starts at 1 in every address
+                          and counts the components left after the punctuation filter. A component that appears
+                          more than once keeps a row per appearance (`break_and_index_address` keeps the last one).
+        """
+        try:
+            # Step 1: Extract the components of every address with the precompiled pattern
+            components = addresses.astype(object).str.findall(self.address_component_pattern)
+
+            # Step 2: Flatten the components into one row per component
+            tokens = components.explode().dropna()
+            tokens = tokens[~tokens.isin(self.address_punctuation)]
+
+            # Step 3: Number the components of every address, starting from 1
+            token_table = pd.DataFrame({
+                "old_index": tokens.index,
+                "token": tokens.to_numpy(dtype=object),
+                "position": tokens.groupby(level=0, sort=False).cumcount().to_numpy() + 1,
+            })
+            return token_table
+        except Exception as error:
+            # Print any error encountered during the execution of the method
+            print(error)
+
+    @instrumented_stage()
+    def melt_and_tokenize(self, df: pd.DataFrame, values_to_filter: list, dtypes: dict = None) -> pd.DataFrame:
+        """
+        Reshapes the wide DataFrame straight into the long table of (old_index, target, text) rows, with the
+        "address_to_explode" column already broken into its tokens.
+
+        The result has the same rows, in the same order, as stacking the DataFrame, filtering out
+        `values_to_filter` and exploding the address (`explode_address`), without building the intermediate
+        long frames: the missing cells are skipped, every other cell gives one row and every address gives one
+        row per token (or one row with a missing text if it has no tokens).
+
+        Parameters:
+            df (pd.DataFrame): The wide DataFrame, one row per input row ('old_index') and one column per target.
+            values_to_filter (list): The targets (columns) left out of the long table.
+            dtypes (dict): The dtypes of the columns (e.g. `output_dtypes`); "category" builds the 'target' column
+                           straight from the column positions. None keeps int64 / object columns.
+
+        Returns:
+            pd.DataFrame: The long DataFrame with the columns 'old_index', 'target' and 'text'.
+        """
+        try:
+            # Step 1: Take the values of the columns that are kept
+            columns = [column for column in df.columns if column not in values_to_filter]
+            values = df[columns].to_numpy(dtype=object)
+
+            # Step 2: Find the non-missing cells row by row (the order of `stack`)
+            row_positions, column_positions = np.nonzero(pd.notna(values))
+            texts = values[row_positions, column_positions]
+            targets = np.asarray(columns, dtype=object)[column_positions]
+
+            # Step 3: Break the addresses into tokens; an address without tokens keeps one missing text
+            is_address = targets == "address_to_explode"
+            address_tokens = [self.break_address(address) or [np.nan] for address in texts[is_address]]
+
+            # Step 4: Every cell gives one row, every address one row per token
+            counts = np.ones(len(texts), dtype=np.int64)
+            counts[is_address] = [len(tokens) for tokens in address_tokens]
+            starts = np.cumsum(counts) - counts
+
+            long_texts = np.empty(counts.sum(), dtype=object)
+            long_texts[starts[~is_address]] = texts[~is_address]
+            address_counts = counts[is_address]
+            token_offsets = np.arange(address_counts.sum()) - np.repeat(np.cumsum(address_counts) - address_counts, address_counts)
+            long_texts[np.repeat(starts[is_address], address_counts) + token_offsets] = np.array(
+                [token for tokens in address_tokens for token in tokens], dtype=object)
+
+            # Step 5: Build the long DataFrame
+            long_df = pd.DataFrame({
+                "old_index": np.repeat(df.index.to_numpy()[row_positions], counts),
+                "target": np.repeat(targets, counts),
+                "text": long_texts,
+            })
+            if dtypes is not None:
+                # The 'target' codes are the column positions, so the repeated strings are never materialized
+                if dtypes.get("target") == "category":
+                    long_df["target"] = pd.Categorical.from_codes(np.repeat(column_positions, counts), categories=columns)
+                long_df = long_df.astype({column: dtype for column, dtype in dtypes.items()
+                                          if column in long_df.columns and column != "target"})
+            return long_df
+        except Exception as error:
+            # Print and handle any error that occurs
+            print(error)
+            self.stage_metrics.record_error(error)
+
+    @instrumented_stage()
     def explode_address(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Splits address strings in the DataFrame into individual components and expands them into separate rows.
@@ -464,7 +646,50 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print and handle any error that occurs
             print(error)
+            self.stage_metrics.record_error(error)
 
+    def classify_address_tokens(self, texts: pd.Series, rules: list = None) -> pd.Series:
+        """
+        Classifies address tokens with a table of rules. Every rule is a (target, pattern) pair; the rules are
+        tried in order and the first pattern that fully matches a text sets its target. Texts that match no rule
+        get `address_token_default`.
+
+        E.g. postcodes can be told apart from street numbers with the rules
+        [("zip", r"\d{3} ?\d{2}"), ("streetNumber", ...)].
+
+        Parameters:
+            texts (pd.Series): The address tokens.
+            rules (list): The (target, pattern) rules; `address_token_rules` by default.
+
+        Returns:
+            pd.Series: The target of every token, with the index of `texts`.
+        """
+        try:
+            rules = self.address_token_rules if rules is None else rules
+
+            # The patterns use the `re` syntax, so the tokens are matched as Python strings
+            texts = texts.astype(object)
+
+            # Step 1: Every token starts with the default target
+            targets = pd.Series(self.address_token_default, index=texts.index, dtype=object)
+            unassigned = pd.Series(True, index=texts.index)
+
+            # Step 2: Apply the rules in order, each one only to the tokens that are still unassigned
+            for target, pattern in rules:
+                remaining_texts = texts[unassigned]
+                if remaining_texts.empty:
+                    break
+                matched = remaining_texts.str.fullmatch(pattern, na=False)
+                matched_index = remaining_texts.index[matched.to_numpy()]
+                targets.loc[matched_index] = target
+                unassigned.loc[matched_index] = False
+
+            return targets
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    @instrumented_stage()
     def rename_address_rows(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Renames the 'target' column in the DataFrame based on the content of the 'text' column,
@@ -476,32 +701,33 @@ class PreprocessingDataClass:
 
         Returns:
             pd.DataFrame: The DataFrame with updated 'target' values for rows where the 'target' was "address_to_explode".
+
+        Note:
+            The tokens are classified by `classify_address_tokens` with the rules of `address_token_rules`.
         """
         try:
             # Reset the DataFrame's index and drop the old index column
             df = df.reset_index().drop(columns=["index"])
             df.fillna(value={"text": " "}, inplace=True)
 
-            # Iterate over each row in the DataFrame
-            for idx, row in df.iterrows():
-                # Check if the 'target' column is "address_to_explode"
-                if row["target"] == "address_to_explode":
-                    # Check if 'text' is a number or contains minor non-numeric content like spaces or hyphens
-                    if re.fullmatch(
-                            r"\d+(?:-\d+)?(?:[Α-ΩA-Za-z](?:'\s*[\dΑ-ΩA-Za-z]*)*)?|\d+(?!ης)[α-ωΑ-Ω]+(?:[-\s]*\d+[α-ωΑ-ΩA-Za-z]*)*",
-                            row["text"]):
-                        # If the text matches a street number pattern, set 'target' to "streetNumber"
-                        df.at[idx, "target"] = "streetNumber"
-                    else:
-                        # Otherwise, set 'target' to "streetName"
-                        df.at[idx, "target"] = "streetName"
+            # Classify the exploded address tokens with the rule table, one vectorized pass per rule
+            address_rows = df["target"] == "address_to_explode"
+            token_targets = self.classify_address_tokens(df.loc[address_rows, "text"])
+
+            # A categorical 'target' column needs the new targets among its categories
+            if isinstance(df["target"].dtype, pd.CategoricalDtype):
+                new_categories = [target for target in pd.unique(token_targets) if target not in df["target"].cat.categories]
+                df["target"] = df["target"].cat.add_categories(new_categories)
+            df.loc[address_rows, "target"] = token_targets
 
             # Return the modified DataFrame
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage("excel_df", "filtered_df")
     def reorder_and_filter(self) -> None:
         """
         Reorders the columns of the DataFrame, transforms the address column, filters specific rows,
@@ -509,13 +735,15 @@ class PreprocessingDataClass:
 
         This method processes the data in the following steps:
         - Reorders columns based on a predefined order
-        - Stacks the DataFrame and reshapes it
-        - Filters unwanted rows based on specific conditions
-        - Explodes and renames address-related rows
+        - Reshapes the DataFrame into a long table, filtering unwanted rows and exploding the address in one pass
+        - Renames address-related rows
         - Adds line numbers and merges with a count of total lines
         - Adds a new column 'AA' containing the value of 'text' from rows where 'target' is 'aa'
         - Filters the DataFrame to remove unnecessary rows
 
+        The long table has the dtypes of `output_dtypes` from the reshape onward (categorical 'target',
+        small integer 'old_index' and line columns, Arrow-backed texts).
+
         Returns:
             None: This method modifies the class attribute `self.filtered_df` in place and does not return any value.
         """
@@ -530,64 +758,269 @@ class PreprocessingDataClass:
             # Step 2: Transform the address column to remove or modify specific substrings
             self.excel_df = self.transform_address(self.excel_df)
 
-            # Step 3: Stack the DataFrame to reshape it, converting columns into multi-level index
-            stacked_df = self.excel_df.stack()
-
-            # Step 4: Reset index after stacking to convert multi-level index into regular columns
-            reset_stacked_df = stacked_df.reset_index()
-
-            # Step 5: Rename columns for clarity after stacking
-            # TODO: Ensure the column names are not hard-coded
-            reset_stacked_df = reset_stacked_df.rename(
-                columns={"level_0": "old_index", "level_1": "target", 0: "text"},
-                errors="raise"
-            )
-
-            # Step 6: Filter out rows where "target" has specific unwanted values (e.g., "data_street", "data_number")
-            column_to_filter = "target"
-            values_to_filter = ["data_street", "data_number"]
-            self.filtered_df = reset_stacked_df[~reset_stacked_df[column_to_filter].isin(values_to_filter)]
-
-            # Step 7: Explode the "text" column, expanding list-like elements into separate rows if necessary
-            self.filtered_df = self.explode_address(self.filtered_df)
+            # Step 3: Reshape the DataFrame into the long (old_index, target, text) table in one pass, filtering out
+            # unwanted targets (e.g., "data_street", "data_number") and breaking the address into tokens
+            # The columns get the compact dtypes of `output_dtypes` here and keep them in the next steps
+            self.filtered_df = self.melt_and_tokenize(self.excel_df, ["data_street", "data_number"], self.output_dtypes)
 
-            # Step 8: Rename rows for categorizing address components as "streetNumber" or "streetName"
+            # Step 4: Rename rows for categorizing address components as "streetNumber" or "streetName"
             self.filtered_df = self.rename_address_rows(self.filtered_df)
 
-            self.filtered_df["text"] = self.filtered_df["text"].apply(lambda x: str(x).strip())
+            self.filtered_df["text"] = self.filtered_df["text"].apply(lambda x: str(x).strip()).astype(
+                self.output_dtypes["text"])
 
-            # Step 9: Add line numbers to the DataFrame
+            # Step 5: Add line numbers to the DataFrame
             self.filtered_df = self.add_line_numbers(self.filtered_df)
 
-            # Step 10: Count the total lines for each "old_index" and merge the result into the DataFrame
+            # Step 6: Count the total lines for each "old_index" and merge the result into the DataFrame
             count_df = self.filtered_df.groupby(["old_index"]).count().iloc[:, 1].rename("total_lines")
             self.filtered_df = self.filtered_df.merge(count_df, how="left", left_on="old_index", right_index=True)
 
-            # Step 11: Calculate the maximum line number for each group, excluding zero values
-            self.filtered_df["total_lines"] = self.filtered_df.groupby("old_index")["line_number"].transform(
-                lambda x: x[x != 0].max())
+            # Step 7: Calculate the maximum line number for each group, excluding zero values
+            # (groups without line numbers get 0, so the column keeps its integer dtype)
+            line_numbers = self.filtered_df["line_number"]
+            self.filtered_df["total_lines"] = line_numbers.where(line_numbers != 0).groupby(
+                self.filtered_df["old_index"]).transform("max").fillna(0).astype(self.output_dtypes["total_lines"])
 
-            # Step 12: Set "total_lines" to 0 for rows where "line_number" is zero
+            # Step 8: Set "total_lines" to 0 for rows where "line_number" is zero
             self.filtered_df.loc[self.filtered_df["line_number"] == 0, "total_lines"] = 0
 
-            # Step 13: Add a new column "AA" with the value of "text" from rows where "target" is "aa"
+            # Step 9: Add a new column "AA" with the value of "text" from rows where "target" is "aa"
             self.filtered_df["AA"] = self.filtered_df.groupby("old_index")["text"].transform(
                 lambda x: x[self.filtered_df["target"] == "aa"].values[0]
-            )
+            ).astype(self.output_dtypes["AA"])
 
-            # Step 14: Keep only the relevant columns for the final DataFrame
+            # Step 10: Keep only the relevant columns for the final DataFrame
             self.filtered_df = self.filtered_df[["old_index", "AA", "target", "text", "line_number", "total_lines"]]
 
-            # Step 15: Remove rows where "target" is either "aa" or "full_address"
+            # Step 11: Remove rows where "target" is either "aa" or "full_address"
             column_to_filter = "target"
             values_to_filter = ["aa", "address"]
             self.filtered_df = self.filtered_df[~self.filtered_df[column_to_filter].isin(values_to_filter)]
 
-            # Step 16: Corrects the values in the 'target' column of a DataFrame by standardizing them
+            # Step 12: Corrects the values in the 'target' column of a DataFrame by standardizing them
             self.correct_target(self.filtered_df)
         except Exception as error:
             # Print and handle any error that occurs
             print(error)
+            self.stage_metrics.record_error(error)
+
+    @instrumented_stage("excel_df", "filtered_df")
+    def reorder_and_filter_sharded(self, n_workers: int, chunk_size: int = None) -> None:
+        """
+        Runs `reorder_and_filter` on chunks of the input rows in a pool of processes and concatenates
+        the results, in the order of the input rows, into `self.filtered_df`.
+
+        Every input row (one 'AA' / 'old_index') is kept whole inside a single chunk, and the chunks keep
+        the original index of the rows, so 'old_index' is the same as in a single-process run.
+
+        Parameters:
+            n_workers (int): The number of worker processes.
+            chunk_size (int): The maximum number of input rows in each chunk.
+                              By default the rows are split in four chunks per worker.
+
+        Returns:
+            None: This method modifies the class attribute `self.filtered_df` in place and does not return any value.
+        """
+        try:
+            # An input sheet without rows has no chunks to process, so it is processed in this process
+            if self.excel_df.empty:
+                self.reorder_and_filter()
+                return
+
+            # Step 1: Split the input rows into contiguous chunks, keeping their original index
+            if chunk_size is None:
+                chunk_size = max(1, -(-len(self.excel_df) // (n_workers * 4)))
+            chunks = [self.excel_df.iloc[start:start + chunk_size] for start in range(0, len(self.excel_df), chunk_size)]
+            print(f"Processing {len(self.excel_df)} rows in {len(chunks)} chunks with {n_workers} workers...")
+
+            # Step 2: Run the reorder_and_filter chain on every chunk in a process pool
+            # and merge the stage metrics of the workers into the metrics of the run
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                chunk_results = list(executor.map(reorder_and_filter_chunk, chunks))
+            chunk_dfs = [chunk_df for chunk_df, _, _ in chunk_results]
+            for _, chunk_records, chunk_origin_time in chunk_results:
+                self.stage_metrics.merge(chunk_records, chunk_origin_time)
+
+            # Step 3: Concatenate the chunk outputs in the order of the input rows
+            self.filtered_df = pd.concat(chunk_dfs, ignore_index=True)
+
+            # Chunks with different 'target' categories concatenate to object, so the categories are united
+            self.filtered_df["target"] = union_categoricals([chunk_df["target"] for chunk_df in chunk_dfs])
+        except Exception as error:
+            # Print and handle any error that occurs
+            print(error)
+            self.stage_metrics.record_error(error)
+
+    def fingerprint_rows(self) -> pd.Series:
+        """
+        Computes a fingerprint of every input row: a 64-bit hash of the 'AA' and the contents of all the cells
+        (the 'rest' column is left out, since `build_rest` derives it from the other cells).
+
+        The columns of the input sheet are kept in `self.fingerprint_columns`: the fingerprints of a previous run
+        are only comparable if the columns did not change.
+
+        Returns:
+            pd.Series: The fingerprints as 16-digit hex strings, with the index of `self.excel_df`.
+        """
+        try:
+            self.fingerprint_columns = [column for column in self.excel_df.columns if column != "rest"]
+            hashes = pd.util.hash_pandas_object(self.excel_df[self.fingerprint_columns], index=False)
+            return pd.Series([f"{value:016x}" for value in hashes.to_numpy()], index=self.excel_df.index, dtype=object)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    def get_output_file(self, output_formats: tuple) -> str:
+        """
+        Returns the name of the output file read back by an incremental run ('output.parquet', 'output.arrow'
+        or 'output.csv', the first one written), or None if none of them is written.
+        """
+        for output_format in ["parquet", "arrow", "csv"]:
+            if output_format in output_formats:
+                return f"output.{output_format}"
+        return None
+
+    def save_fingerprints(self, fingerprints: pd.Series, output_formats: tuple) -> None:
+        """
+        Saves the fingerprints of the input rows of the current output (see `fingerprint_rows`), together with
+        the columns of the input sheet and the name of the output file, to `self.fingerprints_file`.
+
+        Parameters:
+            fingerprints (pd.Series): The fingerprints of the input rows, in the order of 'old_index'.
+            output_formats (tuple): The formats of the output files written by the run.
+        """
+        try:
+            output_file = self.get_output_file(output_formats)
+            if output_file is None or self.filtered_df is None:
+                return
+
+            state = {
+                "columns": self.fingerprint_columns,
+                "output_file": output_file,
+                "fingerprints": fingerprints.tolist(),
+            }
+
+            # Write a temporary file and replace, so an interrupted run never leaves the fingerprints half written
+            fingerprints_path = os.path.join(self.output_csv_path, self.fingerprints_file)
+            with open(fingerprints_path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(state, file)
+            os.replace(fingerprints_path + ".tmp", fingerprints_path)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    def read_previous_output(self, output_file: str) -> pd.DataFrame:
+        """
+        Reads the output of the previous run, with the dtypes of `output_dtypes`.
+
+        Parameters:
+            output_file (str): The name of the output file in `self.output_csv_path` (see `get_output_file`).
+
+        Returns:
+            pd.DataFrame: The previous output.
+        """
+        try:
+            output_file_path = os.path.join(self.output_csv_path, output_file)
+            if output_file.endswith(".csv"):
+                # Read the texts as they were written (an empty text stays empty)
+                previous_df = pd.read_csv(output_file_path, sep=";", keep_default_na=False,
+                                          dtype={"old_index": "int64", "AA": str, "target": str, "text": str,
+                                                 "line_number": "int64", "total_lines": "int64"})
+            else:
+                previous_df = read_output_table(output_file_path)
+
+            return previous_df.astype(self.output_dtypes)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    @instrumented_stage("excel_df", "filtered_df")
+    def reorder_and_filter_incremental(self, fingerprints: pd.Series, output_formats: tuple, n_workers: int = 1) -> None:
+        """
+        Runs `reorder_and_filter` only on the input rows that were added or changed since the previous run,
+        and splices their output into the output of the previous run.
+
+        The rows are matched to the previous run by their fingerprint (see `fingerprint_rows`), so moved rows
+        are reused too: their output gets the new 'old_index'. The output of the deleted rows is dropped.
+        Without fingerprints of a previous run, or if the columns of the input sheet changed, all the rows
+        are processed.
+
+        Parameters:
+            fingerprints (pd.Series): The fingerprints of the current input rows.
+            output_formats (tuple): The formats of the output files (the previous output is read from one of them).
+            n_workers (int): The number of worker processes for the added or changed rows.
+
+        Returns:
+            None: This method modifies the class attribute `self.filtered_df` in place and does not return any value.
+        """
+        try:
+            # Step 1: Load the fingerprints and the output of the previous run
+            fingerprints_path = os.path.join(self.output_csv_path, self.fingerprints_file)
+            state = None
+            if os.path.exists(fingerprints_path):
+                with open(fingerprints_path, encoding="utf-8") as file:
+                    state = json.load(file)
+
+            previous_df = None
+            if (state is not None and state["columns"] == self.fingerprint_columns
+                    and os.path.exists(os.path.join(self.output_csv_path, state["output_file"]))):
+                previous_df = self.read_previous_output(state["output_file"])
+
+            if previous_df is None:
+                print("No previous output to update, processing all the rows...")
+                if n_workers > 1:
+                    self.reorder_and_filter_sharded(n_workers)
+                else:
+                    self.reorder_and_filter()
+                return
+
+            # Step 2: Match every current row to a previous row with the same fingerprint (each one used once)
+            previous_positions = {}
+            for previous_index, fingerprint in enumerate(state["fingerprints"]):
+                previous_positions.setdefault(fingerprint, []).append(previous_index)
+            for positions in previous_positions.values():
+                positions.reverse()
+
+            current_indexes = self.excel_df.index.to_numpy()
+            matched = np.full(len(current_indexes), -1, dtype=np.int64)
+            for position, fingerprint in enumerate(fingerprints.tolist()):
+                positions = previous_positions.get(fingerprint)
+                if positions:
+                    matched[position] = positions.pop()
+
+            # Step 3: Map the 'old_index' of the previous output to the current rows (-1 for the deleted rows)
+            previous_to_current = np.full(len(state["fingerprints"]), -1, dtype=np.int64)
+            previous_to_current[matched[matched >= 0]] = current_indexes[matched >= 0]
+            previous_old_index = previous_df["old_index"].to_numpy()
+            new_old_index = previous_to_current[previous_old_index]
+            kept_df = previous_df[new_old_index >= 0]
+            kept_df["old_index"] = new_old_index[new_old_index >= 0]
+
+            changed_rows = self.excel_df[matched < 0]
+            print(f"Incremental run: {int((matched >= 0).sum())} unchanged, {len(changed_rows)} added or changed, "
+                  f"{int((previous_to_current < 0).sum())} deleted rows.")
+
+            # Step 4: Run the reorder_and_filter chain on the added or changed rows only
+            output_dfs = [kept_df]
+            if len(changed_rows):
+                changed_data = PreprocessingDataClass(None, [], None, excel_df=changed_rows)
+                if n_workers > 1:
+                    changed_data.reorder_and_filter_sharded(n_workers)
+                else:
+                    changed_data.reorder_and_filter()
+                output_dfs.append(changed_data.filtered_df)
+                self.stage_metrics.merge(changed_data.stage_metrics.records, changed_data.stage_metrics.origin_time)
+
+            # Step 5: Splice the outputs in the order of the input rows (the rows of an input row keep their order)
+            self.filtered_df = pd.concat(output_dfs, ignore_index=True)
+            self.filtered_df["target"] = union_categoricals([output_df["target"] for output_df in output_dfs])
+            self.filtered_df = self.filtered_df.sort_values("old_index", kind="stable").reset_index(drop=True)
+            self.filtered_df = self.filtered_df.astype(self.output_dtypes)
+        except Exception as error:
+            # Print and handle any error that occurs
+            print(error)
+            self.stage_metrics.record_error(error)
 
     def generate_replacement_map(self, df: pd.DataFrame) -> dict:
         """
@@ -632,6 +1065,7 @@ class PreprocessingDataClass:
             # Print any error encountered during execution
             print(error)
 
+    @instrumented_stage()
     def correct_target(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Corrects the values in the 'target' column of a DataFrame by standardizing them.
@@ -646,22 +1080,40 @@ class PreprocessingDataClass:
             This function standardizes values in the 'target' column by removing suffixes
             (e.g., 'streetName.1' becomes 'streetName'). It checks against a replacement map
             generated from the DataFrame to ensure that correct values are retained.
+            Only the distinct values are standardized, and the 'target' column becomes categorical.
         """
         try:
-            # Generate a replacement map for the 'target' column
-            replacements = self.generate_replacement_map(df)
-
-            # Correct the 'target' column by standardizing values
-            df["target"] = df["target"].apply(
-                lambda target_value: target_value.split('.')[0] if target_value not in replacements else target_value
-            )
+            # Step 1: Encode the 'target' column as codes of its distinct values, in order of appearance
+            codes, distinct_targets = pd.factorize(df["target"])
+            target_layout = tuple(distinct_targets)
+
+            # Step 2: Correct the distinct values once per layout of distinct values (i.e. per header layout);
+            # the same layout reuses the cached categories and the code of every distinct value
+            if target_layout not in self.target_correction_cache:
+                # Generate a replacement map for the distinct 'target' values
+                replacements = self.generate_replacement_map(pd.DataFrame({"target": distinct_targets}))
+
+                # Standardize the distinct values
+                corrected_targets = [target_value.split('.')[0] if target_value not in replacements else target_value
+                                     for target_value in distinct_targets]
+                categories = list(dict.fromkeys(corrected_targets))
+                category_codes = np.array([categories.index(target_value) for target_value in corrected_targets],
+                                          dtype=np.int64)
+                self.target_correction_cache[target_layout] = (categories, category_codes)
+            categories, category_codes = self.target_correction_cache[target_layout]
+
+            # Step 3: Map the codes back through a categorical 'target' column (missing values keep code -1)
+            df["target"] = pd.Categorical.from_codes(np.where(codes >= 0, category_codes[codes], -1),
+                                                     categories=categories)
 
             # Return the DataFrame with corrected 'target' values
             return df
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage("filtered_df")
     def write_in_csv(self) -> None:
         """
         Saves the filtered DataFrame to a CSV file.
@@ -680,7 +1132,79 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print any error encountered during execution
             print(error)
+            self.stage_metrics.record_error(error)
+
+    def build_output_table(self) -> "pa.Table":
+        """
+        Converts the filtered DataFrame to a pyarrow Table with a compact schema:
+        'target' is dictionary-encoded, 'old_index' is int32 and the line columns are int16.
+
+        Returns:
+            pa.Table: The output table with the columns 'old_index', 'AA', 'target', 'text', 'line_number', 'total_lines'.
+        """
+        try:
+            # Define the compact schema of the output table
+            schema = pa.schema([
+                ("old_index", pa.int32()),
+                ("AA", pa.string()),
+                ("target", pa.dictionary(pa.int16(), pa.string())),
+                ("text", pa.string()),
+                ("line_number", pa.int16()),
+                ("total_lines", pa.int16()),
+            ])
+
+            # The columns already have the dtypes of `output_dtypes`; the cast only guards DataFrames built elsewhere
+            output_df = self.filtered_df[schema.names].astype({
+                "old_index": "int32",
+                "line_number": "int16",
+                "total_lines": "int16",
+            })
+
+            return pa.Table.from_pandas(output_df, schema=schema, preserve_index=False)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    @instrumented_stage("filtered_df")
+    def write_in_parquet(self) -> None:
+        """
+        Saves the filtered DataFrame as 'output.parquet' in the directory `self.output_csv_path`,
+        with the compact schema of `build_output_table`.
+        """
+        try:
+            # Define the path for the output Parquet file
+            output_parquet_path = os.path.join(self.output_csv_path, "output.parquet")
+
+            # Save the output table as a Parquet file
+            pq.write_table(self.build_output_table(), output_parquet_path)
+            print(f"Saved in Parquet file 'output.parquet' in {output_parquet_path}.")
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+            self.stage_metrics.record_error(error)
+
+    @instrumented_stage("filtered_df")
+    def write_in_arrow(self) -> None:
+        """
+        Saves the filtered DataFrame as 'output.arrow' (Arrow IPC file format) in the directory `self.output_csv_path`,
+        with the compact schema of `build_output_table`. The file is not compressed, so it can be memory-mapped.
+        """
+        try:
+            # Define the path for the output Arrow IPC file
+            output_arrow_path = os.path.join(self.output_csv_path, "output.arrow")
+
+            # Save the output table as an Arrow IPC file
+            output_table = self.build_output_table()
+            with pa.OSFile(output_arrow_path, "wb") as sink:
+                with pa.ipc.new_file(sink, output_table.schema) as writer:
+                    writer.write_table(output_table)
+            print(f"Saved in Arrow IPC file 'output.arrow' in {output_arrow_path}.")
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+            self.stage_metrics.record_error(error)
 
+    @instrumented_stage("filtered_df")
     def write_in_excel(self) -> None:
         """
         Writes the filtered DataFrame to a new sheet in the existing Excel file and also saves it as a CSV file.
@@ -717,9 +1241,154 @@ class PreprocessingDataClass:
         except Exception as error:
             # Print and handle any error that occurs
             print(error)
+            self.stage_metrics.record_error(error)
+
+    @instrumented_stage("filtered_df")
+    def write_in_excel_streaming(self, include_output: bool) -> None:
+        """
+        Writes the 'rest' column built by `build_rest` to the input sheet of the Excel file and, optionally,
+        the filtered DataFrame to the output sheet, in a single streaming pass over the workbook.
+
+        Parameters:
+            include_output (bool): Whether to write the filtered DataFrame to the output sheet.
+
+        Returns:
+            None: The method writes to the Excel file but does not return any value.
+        """
+        try:
+            # Write the 'rest' column and the output sheet (excluding the "old_index" column) in one pass
+            write_workbook_streaming(
+                self.excel_file,
+                input_sheet=self.input_sheet,
+                new_column="rest" if self.rest_data is not None else None,
+                new_column_values=self.rest_data,
+                after_column=self.address_name,
+                output_sheet=self.output_sheet,
+                output_df=self.filtered_df.loc[:, self.filtered_df.columns != "old_index"] if include_output else None,
+            )
+            print(f"Saved 'rest' column{' and new tab ' + repr(self.output_sheet) if include_output else ''} "
+                  f"within '{self.excel_file}'.")
+        except Exception as error:
+            # Print and handle any error that occurs
+            print(error)
+            self.stage_metrics.record_error(error)
+
+
+def read_output_table(file_path: str, to_pandas: bool = True):
+    """
+    Loads an output table written by `write_in_parquet` ('.parquet') or `write_in_arrow` ('.arrow'),
+    memory-mapping the file instead of reading it in memory.
+
+    Parameters:
+    - file_path (str): The path of the '.parquet' or '.arrow' file.
+    - to_pandas (bool): Whether to return a pandas DataFrame ('target' becomes categorical) or the pyarrow Table.
+                        An Arrow IPC file returned as a pyarrow Table is not copied out of the memory map.
+
+    Returns:
+    - pd.DataFrame | pa.Table: The output table.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            # Read the Parquet file through a memory map
+            output_table = pq.read_table(file_path, memory_map=True)
+        else:
+            # Open the Arrow IPC file as a memory map, the buffers of the table point to the mapped file
+            output_table = pa.ipc.open_file(pa.memory_map(file_path, "r")).read_all()
+
+        return output_table.to_pandas() if to_pandas else output_table
+    except Exception as error:
+        # Print any error encountered during execution
+        print(error)
+
+
+def reorder_and_filter_chunk(excel_df: pd.DataFrame) -> tuple:
+    """
+    Worker function of `PreprocessingDataClass.reorder_and_filter_sharded`.
+    Runs the `reorder_and_filter` chain on a chunk of the input rows.
+
+    Parameters:
+    - excel_df (pd.DataFrame): A chunk of the input sheet, after `drop_columns` and `build_rest`.
+
+    Returns:
+    - tuple: The filtered DataFrame of the chunk, and the stage metrics records of the chunk with their
+             `origin_time` (see `StageMetrics.merge`).
+    """
+    # The chunk is given directly, so the Excel file is neither read nor written
+    preprocessed_chunk = PreprocessingDataClass(None, [], None, excel_df=excel_df)
+    preprocessed_chunk.reorder_and_filter()
+    stage_metrics = preprocessed_chunk.stage_metrics
+    return preprocessed_chunk.filtered_df, stage_metrics.records, stage_metrics.origin_time
+
+
+def process_excel_file(excel_file: str, columns_to_drop: list, output_csv_path: str, print_excel: bool = False,
+                       n_workers: int = 1, streaming_io: bool = False, output_formats: tuple = ("csv",),
+                       incremental: bool = False) -> PreprocessingDataClass:
+    """
+    Runs the stages of the preprocessing of an Excel file: reads and filters its input rows, and writes the output
+    files and sheet. Used by `main` and by the batch driver (`batch_preprocessing`).
+
+    Parameters:
+    - excel_file (str): The path to the Excel file to process.
+    - columns_to_drop (list): A list of column names to be dropped from the Excel file.
+    - output_csv_path (str): The directory path where the output files will be saved.
+    - print_excel (bool): Whether to write the output to a new sheet in the Excel file.
+    - n_workers (int): The number of worker processes; with more than one the input rows are processed in chunks.
+    - streaming_io (bool): Whether to write the Excel file once, row by row, with bounded memory.
+    - output_formats (tuple): The formats of the output file(s) to save: "csv", "parquet" and/or "arrow".
+    - incremental (bool): Whether to process only the input rows added or changed since the previous run
+                          and update its output (the fingerprints of the rows are saved with every output).
+
+    Returns:
+    - PreprocessingDataClass: The processed data, with the output in `filtered_df` and the metrics of the stages
+                              in `stage_metrics`.
+    """
+    # Print a message indicating the start of processing
+    print(f"Processing for '{excel_file}'...")
+
+    # Create an instance of the PreprocessingDataClass with the provided Excel file, columns to drop, and output path
+    preprocessed_data = PreprocessingDataClass(excel_file, columns_to_drop, output_csv_path,
+                                               streaming_io=streaming_io)
+
+    # Call the method to drop specified columns
+    preprocessed_data.drop_columns()
+
+    # Call the method to construct a "rest" column in the Excel file
+    preprocessed_data.build_rest()
 
+    # Fingerprint the input rows, before the reordering changes them
+    fingerprints = preprocessed_data.fingerprint_rows()
 
-def main(excel_file: str, columns_to_drop: list, output_csv_path: str, print_excel: bool = False) -> None:
+    # Call the method to reorder and filter the DataFrame, only for the changed rows and/or in a pool of
+    # processes if requested
+    if incremental:
+        preprocessed_data.reorder_and_filter_incremental(fingerprints, output_formats, n_workers)
+    elif n_workers > 1:
+        preprocessed_data.reorder_and_filter_sharded(n_workers)
+    else:
+        preprocessed_data.reorder_and_filter()
+
+    # Call the methods to write the processed DataFrame to .csv, .parquet and/or .arrow files
+    if "csv" in output_formats:
+        preprocessed_data.write_in_csv()
+    if "parquet" in output_formats:
+        preprocessed_data.write_in_parquet()
+    if "arrow" in output_formats:
+        preprocessed_data.write_in_arrow()
+
+    # Call the method to write the processed DataFrame to a new sheet in the Excel file and save as a CSV
+    if streaming_io:
+        preprocessed_data.write_in_excel_streaming(include_output=print_excel)
+    elif print_excel:
+        preprocessed_data.write_in_excel()
+
+    # Save the fingerprints of the input rows with the output, for the next incremental run
+    preprocessed_data.save_fingerprints(fingerprints, output_formats)
+    return preprocessed_data
+
+
+def main(excel_file: str, columns_to_drop: list, output_csv_path: str, print_excel: bool = False,
+         n_workers: int = 1, streaming_io: bool = False, output_formats: tuple = ("csv",),
+         incremental: bool = False, metrics_file: str = None, trace_file: str = None) -> None:
     """
     Main function to process Excel data, correct values in the "target" column,
     and output the updated data to a new tab in the same Excel file and a CSV file.
@@ -728,36 +1397,32 @@ def main(excel_file: str, columns_to_drop: list, output_csv_path: str, print_exc
     - excel_file (str): The path to the Excel file to process.
     - columns_to_drop (list): A list of column names to be dropped from the Excel file.
     - output_csv_path (str): The directory path where the output CSV file will be saved.
+    - print_excel (bool): Whether to write the output to a new sheet in the Excel file.
+    - n_workers (int): The number of worker processes; with more than one the input rows are processed in chunks.
+    - streaming_io (bool): Whether to write the Excel file once, row by row, with bounded memory.
+    - output_formats (tuple): The formats of the output file(s) to save: "csv", "parquet" and/or "arrow".
+    - incremental (bool): Whether to process only the input rows added or changed since the previous run
+                          and update its output (the fingerprints of the rows are saved with every output).
+    - metrics_file (str): The path of a JSON file for the wall time, peak memory and rows of every stage, or None.
+    - trace_file (str): The path of a Chrome trace (chrome://tracing, Perfetto) of the stages, or None.
 
     Returns:
     - None: The function processes the data and writes the results to files, but does not return any value.
     """
     try:
-        # Print a message indicating the start of processing
-        print(f"Processing for '{excel_file}'...")
-
         # Optional: Change the directory to the raw data directory (commented out)
         # os.chdir(r"../../data/raw")
         # excel_file = "input_output_template - Copy.xlsx"
 
-        # Create an instance of the PreprocessingDataClass with the provided Excel file, columns to drop, and output path
-        preprocessed_data = PreprocessingDataClass(excel_file, columns_to_drop, output_csv_path)
-
-        # Call the method to drop specified columns
-        preprocessed_data.drop_columns()
-
-        # Call the method to construct a "rest" column in the Excel file
-        preprocessed_data.build_rest()
-
-        # Call the method to reorder and filter the DataFrame
-        preprocessed_data.reorder_and_filter()
-
-        # Call the method to write the processed DataFrame to .csv file
-        preprocessed_data.write_in_csv()
+        # Run the stages of the preprocessing
+        preprocessed_data = process_excel_file(excel_file, columns_to_drop, output_csv_path, print_excel, n_workers,
+                                               streaming_io, output_formats, incremental)
 
-        # Call the method to write the processed DataFrame to a new sheet in the Excel file and save as a CSV
-        if print_excel:
-            preprocessed_data.write_in_excel()
+        # Export the metrics of the stages
+        if metrics_file:
+            preprocessed_data.stage_metrics.to_json(metrics_file)
+        if trace_file:
+            preprocessed_data.stage_metrics.to_chrome_trace(trace_file)
     except Exception as main_error:
         # Print any error encountered during the execution of the main function
         print(main_error)
@@ -770,6 +1435,12 @@ if __name__ == '__main__':
             "columns_to_drop": [],  # Set the columns to be dropped
             "output_csv_path": r"...",  # Set the path for where 'output.csv' will be saved
             "print_excel": False,  # Set whether to print or not the output to a new sheet in initial excel
+            "n_workers": 1,  # Set the number of processes used to process the input rows
+            "streaming_io": False,  # Set whether to write the Excel file row by row, with bounded memory
+            "output_formats": ("csv",),  # Set the output file formats: "csv", "parquet" and/or "arrow"
+            "incremental": False,  # Set whether to process only the rows changed since the previous run
+            "metrics_file": None,  # Set the JSON file of the stage metrics (None: not saved)
+            "trace_file": None,  # Set the Chrome trace file of the stages (None: not saved)
         }
         main(**kwargs)
     except Exception as error:
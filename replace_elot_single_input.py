@@ -1,4 +1,5 @@
 try:
+    from functools import lru_cache
     import pandas as pd
 except ImportError as import_error:
     print(import_error)
@@ -7,8 +8,469 @@ except ImportError as import_error:
 pd.set_option("display.max_columns", None)
 #pd.options.mode.copy_on_write = True
 
+# Maximum number of normalized words kept per replacement group before the cache is reset
+WORD_CACHE_SIZE = 200000
+
+# Normalized words per replacement group, shared by every ReplaceClass instance
+word_caches = {}
+
+
+def rule_keeps_word_boundaries(key: str, value: str) -> bool:
+    """
+    Checks whether a (key, value) replacement rule leaves the spaces of a string in place.
+
+    This is the case when the key contains no space other than a single leading or trailing one,
+    and the value keeps exactly the same leading and trailing space.
+    E.g. ("ΑΥ ", "AF ") and ("Χ", "CH") keep the word boundaries, ("Α Β", "AB") does not.
+
+    Parameters:
+    - key (str): The substring to be replaced.
+    - value (str): The replacement string.
+
+    Returns:
+    - bool: True if the rule can be applied to each word of a string separately.
+    """
+    key_core, value_core = key.strip(" "), value.strip(" ")
+
+    # The key must not span over a space, and must not be made only of spaces
+    if not key_core or " " in key_core or " " in value_core:
+        return False
+
+    key_leading, key_trailing = key.startswith(" "), key.endswith(" ")
+
+    # A key with spaces on both sides would share the space between two neighbouring words
+    if key_leading and key_trailing or len(key) - len(key_core) > 1:
+        return False
+
+    # A plain deletion is allowed as long as there is no space involved
+    if not value:
+        return not (key_leading or key_trailing)
+
+    # Otherwise the value must keep the same leading or trailing space as the key
+    return (
+        value_core != ""
+        and (key_leading, key_trailing) == (value.startswith(" "), value.endswith(" "))
+        and len(value) - len(value_core) == len(key) - len(key_core)
+    )
+
+
+@lru_cache(maxsize=None)
+def rules_are_word_separable(rules: tuple) -> bool:
+    """
+    Checks, once per distinct rule list, whether all the replacement rules keep the word boundaries.
+    When they do, normalizing a string is equal to normalizing each of its space separated words.
+
+    Parameters:
+    - rules (tuple): The (key, value) replacement rules.
+
+    Returns:
+    - bool: True if every rule keeps the word boundaries.
+    """
+    return all(rule_keeps_word_boundaries(key, value) for key, value in rules)
+
 
 class ReplaceClass:
+    # The replacement tables are class attributes, so they are built once per process
+    # and shared by every instance instead of being re-created for each input string
+    replacements_normalize_string = [
+        ("ΟΥ", "U"),
+        ("ΟΙ", "Ι"),
+        ("ΥΙ", "Ι"),
+        ("ΕΙ", "Ι"),
+        ("ΑΙ", "Ε"),
+        ("Η", "Ι"),
+        ("Υ", "Ι"),
+        ("Ω", "Ο"),
+        ("Ά", "Α"),
+        ("Έ", "Ε"),
+        ("Ί", "Ι"),
+        ("Ϊ", "Ι"),
+    ]
+
+    replacements_normalize_string_EngELOT743_lower = [
+        ("άι", "α$$"),
+        ("όι", "ο$$"),
+        ("έι", "ε$$"),
+        ("ά", "α"),
+        ("έ", "ε"),
+        ("ΐ", "ϊ"),
+        ("αϊ", "ai"),
+        ("αΐ", "ai"),
+        ("εϊ", "ei"),
+        ("εΐ", "ei"),
+        ("οϊ", "oi"),
+        ("οΐ", "oi"),
+        ("οϋ", "oi"),
+        ("οΰ", "oi"),
+        ("ϊ", "υ"),
+        ("ΰ", "υ"),
+        ("ί", "ι"),
+        ("ή", "η"),
+        ("ό", "ο"),
+        ("ώ", "ω"),
+        ("ύ", "υ"),
+        ("ϋ", "υ"),
+        ("ΰ", "υ"),
+        ("$$", "ι"),
+    ]
+
+    replacements_normalize_string_EngELOT743_upper = [
+        ("ΑΥΑ", "AVΑ"),
+        ("ΑΥΒ", "AV"),
+        ("ΑΥΓ", "AVΓ"),
+        ("ΑΥΔ", "AVΔ"),
+        ("ΑΥΕ", "AVΕ"),
+        ("ΑΥΖ", "AVΖ"),
+        ("ΑΥΗ", "AVΗ"),
+        ("ΑΥΙ", "AVΙ"),
+        ("ΑΥΛ", "AVΛ"),
+        ("ΑΥΜ", "AVΜ"),
+        ("ΑΥΝ", "AVΝ"),
+        ("ΑΥΡ", "AVΡ"),
+        ("ΑΥΟ", "AVΟ"),
+        ("ΑΥΥ", "AVΥ"),
+        ("ΑΥΩ", "AVΩ"),
+        ("ΑΥΘ", "AFΘ"),
+        ("ΑΥΚ", "AFΚ"),
+        ("ΑΥΞ", "AFΞ"),
+        ("ΑΥΠ", "AFΠ"),
+        ("ΑΥΣ", "AFΣ"),
+        ("ΑΥΤ", "AFΤ"),
+        ("ΑΥΦ", "AFΦ"),
+        ("ΑΥΧ", "AFΧ"),
+        ("ΑΥΨ", "AFΨ"),
+        ("ΑΥ ", "AF "),
+        ("ΕΥΑ", "EVΑ"),
+        ("ΕΥΒ", "EV"),
+        ("ΕΥΓ", "EVΓ"),
+        ("ΕΥΔ", "EVΔ"),
+        ("ΕΥΕ", "EVΕ"),
+        ("ΕΥΖ", "EVΖ"),
+        ("ΕΥΗ", "EVΗ"),
+        ("ΕΥΙ", "EVΙ"),
+        ("ΕΥΛ", "EVΛ"),
+        ("ΕΥΜ", "EVΜ"),
+        ("ΕΥΝ", "EVΝ"),
+        ("ΕΥΡ", "EVΡ"),
+        ("ΕΥΟ", "EVΟ"),
+        ("ΕΥΥ", "EVΥ"),
+        ("ΕΥΩ", "EVΩ"),
+        ("ΕΥΘ", "EFΘ"),
+        ("ΕΥΚ", "EFΚ"),
+        ("ΕΥΞ", "EFΞ"),
+        ("ΕΥΠ", "EFΠ"),
+        ("ΕΥΣ", "EFΣ"),
+        ("ΕΥΤ", "EFΤ"),
+        ("ΕΥΦ", "EFΦ"),
+        ("ΕΥΧ", "EFΧ"),
+        ("ΕΥΨ", "EFΨ"),
+        ("ΕΥ ", "EF "),
+        ("ΗΥΑ", "IVΑ"),
+        ("ΗΥΒ", "IV"),
+        ("ΗΥΓ", "IVΓ"),
+        ("ΗΥΔ", "IVΔ"),
+        ("ΗΥΕ", "IVΕ"),
+        ("ΗΥΖ", "IVΖ"),
+        ("ΗΥΗ", "IVΗ"),
+        ("ΗΥΙ", "IVΙ"),
+        ("ΗΥΛ", "IVΛ"),
+        ("ΗΥΜ", "IVΜ"),
+        ("ΗΥΝ", "IVΝ"),
+        ("ΗΥΡ", "IVΡ"),
+        ("ΗΥΟ", "IVΟ"),
+        ("ΗΥΥ", "IVΥ"),
+        ("ΗΥΩ", "IVΩ"),
+        ("ΗΥΘ", "IFΘ"),
+        ("ΗΥΚ", "IFΚ"),
+        ("ΗΥΞ", "IFΞ"),
+        ("ΗΥΠ", "IFΠ"),
+        ("ΗΥΣ", "IFΣ"),
+        ("ΗΥΤ", "IFΤ"),
+        ("ΗΥΦ", "IFΦ"),
+        ("ΗΥΧ", "IFΧ"),
+        ("ΗΥΨ", "IFΨ"),
+        ("ΗΥ ", "IF "),
+        (" ΜΠ", " B"),
+        ("ΓΓ", "NG"),
+        ("ΓΞ", "NX"),
+        ("ΓΧ", "NCH"),
+        ("ΟΥ", "OU"),
+        ("Χ", "CH"),
+        ("Ψ", "PS"),
+        ("Θ", "TH"),
+        ("Ά", "A"),
+        ("Α", "A"),
+        ("Β", "V"),
+        ("Γ", "G"),
+        ("Δ", "D"),
+        ("Ε", "E"),
+        ("Έ", "E"),
+        ("Ζ", "Z"),
+        ("Η", "I"),
+        ("Ή", "I"),
+        ("Ι", "I"),
+        ("Ί", "I"),
+        ("Κ", "K"),
+        ("Λ", "L"),
+        ("Μ", "M"),
+        ("Ν", "N"),
+        ("Ξ", "X"),
+        ("Ο", "O"),
+        ("Π", "P"),
+        ("Ρ", "R"),
+        ("Σ", "S"),
+        ("Τ", "T"),
+        ("Ύ", "Y"),
+        ("Υ", "Y"),
+        ("Φ", "F"),
+        ("Ω", "O"),
+        ("Ώ", "O"),
+    ]
+
+    replacements_normalize_string_Eng_lower = [
+        ("άι", "α$$"),
+        ("όι", "ο$$"),
+        ("έι", "ε$$"),
+        ("ά", "α"),
+        ("έ", "ε"),
+        ("ΐ", "ϊ"),
+        ("αϊ", "ai"),
+        ("αΐ", "ai"),
+        ("εϊ", "ei"),
+        ("εΐ", "ei"),
+        ("οϊ", "oi"),
+        ("οΐ", "oi"),
+        ("οϋ", "oi"),
+        ("οΰ", "oi"),
+        ("ϊ", "υ"),
+        ("ΰ", "υ"),
+        ("ί", "ι"),
+        ("ή", "η"),
+        ("ό", "ο"),
+        ("ώ", "ω"),
+        ("ύ", "υ"),
+        ("ϋ", "υ"),
+        ("ΰ", "υ"),
+        ("$$", "ι"),
+    ]
+
+    replacements_normalize_string_Eng_upper = [
+        ("ΑΥΣΑ", "ΑΥSΑ"),
+        ("ΑΥΣΕ", "ΑΥSΕ"),
+        ("ΑΥΣΙ", "ΑΥSΙ"),
+        ("ΑΥΣΗ", "ΑΥSΗ"),
+        ("ΑΥΣΟ", "ΑΥSΟ"),
+        ("ΑΥΣΥ", "ΑΥSΥ"),
+        ("ΑΥΣΩ", "ΑΥSΩ"),
+        ("ΕΥΣΑ", "ΕΥSΑ"),
+        ("ΕΥΣΕ", "ΕΥSΕ"),
+        ("ΕΥΣΙ", "ΕΥSΙ"),
+        ("ΕΥΣΗ", "ΕΥSΗ"),
+        ("ΕΥΣΟ", "ΕΥSΟ"),
+        ("ΕΥΣΥ", "ΕΥSΥ"),
+        ("ΕΥΣΩ", "ΕΥSΩ"),
+        ("ΕΙΣΑ", "ΕΙΣΣΑ"),
+        ("ΕΙΣΕ", "ΕΙΣΣΕ"),
+        ("ΕΙΣΙ", "ΕΙΣΣΙ"),
+        ("ΕΙΣΗ", "ΕΙΣΣΗ"),
+        ("ΕΙΣΟ", "ΕΙΣΣΟ"),
+        ("ΕΙΣΥ", "ΕΙΣΣΥ"),
+        ("ΕΙΣΩ", "ΕΙΣΣΩ"),
+        ("ΥΙΣΑ", "ΥΙΣΣΑ"),
+        ("ΥΙΣΕ", "ΥΙΣΣΕ"),
+        ("ΥΙΣΙ", "ΥΙΣΣΙ"),
+        ("ΥΙΣΗ", "ΥΙΣΣΗ"),
+        ("ΥΙΣΟ", "ΥΙΣΣΟ"),
+        ("ΥΙΣΥ", "ΥΙΣΣΥ"),
+        ("ΥΙΣΩ", "ΥΙΣΣΩ"),
+        ("ΑΙΣΑ", "ΑΙΣΣΑ"),
+        ("ΑΙΣΕ", "ΑΙΣΣΕ"),
+        ("ΑΙΣΙ", "ΑΙΣΣΙ"),
+        ("ΑΙΣΗ", "ΑΙΣΣΗ"),
+        ("ΑΙΣΟ", "ΑΙΣΣΟ"),
+        ("ΑΙΣΥ", "ΑΙΣΣΥ"),
+        ("ΑΙΣΩ", "ΑΙΣΣΩ"),
+        ("ΟΙΣΑ", "ΟΙΣΣΑ"),
+        ("ΟΙΣΕ", "ΟΙΣΣΕ"),
+        ("ΟΙΣΙ", "ΟΙΣΣΙ"),
+        ("ΟΙΣΗ", "ΟΙΣΣΗ"),
+        ("ΟΙΣΟ", "ΟΙΣΣΟ"),
+        ("ΟΙΣΥ", "ΟΙΣΣΥ"),
+        ("ΟΙΣΩ", "ΟΙΣΣΩ"),
+        ("ΟΥΣΑ", "ΟΥΣΣΑ"),
+        ("ΟΥΣΕ", "ΟΥΣΣΕ"),
+        ("ΟΥΣΙ", "ΟΥΣΣΙ"),
+        ("ΟΥΣΗ", "ΟΥΣΣΗ"),
+        ("ΟΥΣΟ", "ΟΥΣΣΟ"),
+        ("ΟΥΣΥ", "ΟΥΣΣΥ"),
+        ("ΟΥΣΩ", "ΟΥΣΣΩ"),
+        ("ΑΣΥΙ", "ΑΣΣΥΙ"),
+        ("ΕΣΥΙ", "ΕΣΣΥΙ"),
+        ("ΙΣΥΙ", "ΙΣΣΥΙ"),
+        ("ΗΣΥΙ", "ΗΣΣΥΙ"),
+        ("ΟΣΥΙ", "ΟΣΣΥΙ"),
+        ("ΥΣΥΙ", "ΥΣΣΥΙ"),
+        ("ΩΣΥΙ", "ΩΣΣΥΙ"),
+        ("ΑΣΑΙ", "ΑΣΣΑΙ"),
+        ("ΕΣΑΙ", "ΕΣΣΑΙ"),
+        ("ΙΣΑΙ", "ΙΣΣΑΙ"),
+        ("ΗΣΑΙ", "ΗΣΣΑΙ"),
+        ("ΟΣΑΙ", "ΟΣΣΑΙ"),
+        ("ΥΣΑΙ", "ΥΣΣΑΙ"),
+        ("ΩΣΑΙ", "ΩΣΣΑΙ"),
+        ("ΑΣΟΙ", "ΑΣΣΟΙ"),
+        ("ΕΣΟΙ", "ΕΣΣΟΙ"),
+        ("ΙΣΟΙ", "ΙΣΣΟΙ"),
+        ("ΗΣΟΙ", "ΗΣΣΟΙ"),
+        ("ΟΣΟΙ", "ΟΣΣΟΙ"),
+        ("ΥΣΟΙ", "ΥΣΣΟΙ"),
+        ("ΩΣΟΙ", "ΩΣΣΟΙ"),
+        ("ΑΣΟΥ", "ΑΣΣΟΥ"),
+        ("ΕΣΟΥ", "ΕΣΣΟΥ"),
+        ("ΙΣΟΥ", "ΙΣΣΟΥ"),
+        ("ΗΣΟΥ", "ΗΣΣΟΥ"),
+        ("ΟΣΟΥ", "ΟΣΣΟΥ"),
+        ("ΥΣΟΥ", "ΥΣΣΟΥ"),
+        ("ΩΣΟΥ", "ΩΣΣΟΥ"),
+        ("ΑΣΕΥ", "ΑΣΣΕΥ"),
+        ("ΕΣΕΥ", "ΕΣΣΕΥ"),
+        ("ΙΣΕΥ", "ΙΣΣΕΥ"),
+        ("ΗΣΕΥ", "ΗΣΣΕΥ"),
+        ("ΟΣΕΥ", "ΟΣΣΕΥ"),
+        ("ΥΣΕΥ", "ΥΣΣΕΥ"),
+        ("ΩΣΕΥ", "ΩΣΣΕΥ"),
+        ("ΑΣΑΥ", "ΑΣΣΑΥ"),
+        ("ΕΣΑΥ", "ΕΣΣΑΥ"),
+        ("ΙΣΑΥ", "ΙΣΣΑΥ"),
+        ("ΗΣΑΥ", "ΗΣΣΑΥ"),
+        ("ΟΣΑΥ", "ΟΣΣΑΥ"),
+        ("ΥΣΑΥ", "ΥΣΣΑΥ"),
+        ("ΩΣΑΥ", "ΩΣΣΑΥ"),
+        ("ΑΣΕΙ", "ΑΣΣΕΙ"),
+        ("ΕΣΕΙ", "ΕΣΣΕΙ"),
+        ("ΙΣΕΙ", "ΙΣΣΕΙ"),
+        ("ΗΣΕΙ", "ΗΣΣΕΙ"),
+        ("ΟΣΕΙ", "ΟΣΣΕΙ"),
+        ("ΥΣΕΙ", "ΥΣΣΕΙ"),
+        ("ΩΣΕΙ", "ΩΣΣΕΙ"),
+        ("ΑΣΑ", "ΑΣΣΑ"),
+        ("ΑΣΕ", "ΑΣΣΕ"),
+        ("ΑΣΗ", "ΑΣΣΗ"),
+        ("ΑΣΙ", "ΑΣΣΙ"),
+        ("ΑΣΟ", "ΑΣΣΟ"),
+        ("ΑΣΥ", "ΑΣΣΥ"),
+        ("ΑΣΩ", "ΑΣΣΩ"),
+        ("ΕΣΑ", "ΕΣΣΑ"),
+        ("ΕΣΕ", "ΕΣΣΕ"),
+        ("ΕΣΗ", "ΕΣΣΗ"),
+        ("ΕΣΙ", "ΕΣΣΙ"),
+        ("ΕΣΟ", "ΕΣΣΟ"),
+        ("ΕΣΥ", "ΕΣΣΥ"),
+        ("ΕΣΩ", "ΕΣΣΩ"),
+        ("ΗΣΑ", "ΕΣΣΑ"),
+        ("ΗΣΕ", "ΕΣΣΕ"),
+        ("ΗΣΗ", "ΕΣΣΗ"),
+        ("ΗΣΙ", "ΗΣΣΙ"),
+        ("ΗΣΙ", "ΕΣΣΙ"),
+        ("ΗΣΟ", "ΗΣΣΟ"),
+        ("ΗΣΟ", "ΕΣΣΟ"),
+        ("ΗΣΥ", "ΕΣΣΥ"),
+        ("ΗΣΩ", "ΕΣΣΩ"),
+        ("ΙΣΑ", "IΣΣΑ"),
+        ("ΙΣΕ", "IΣΣΕ"),
+        ("ΙΣΗ", "IΣΣΗ"),
+        ("ΙΣΙ", "IΣΣΙ"),
+        ("ΙΣΟ", "IΣΣΟ"),
+        ("ΙΣΥ", "IΣΣΥ"),
+        ("ΙΣΩ", "IΣΣΩ"),
+        ("ΟΣΑ", "ΟΣΣΑ"),
+        ("ΟΣΕ", "ΟΣΣΕ"),
+        ("ΟΣΗ", "ΟΣΣΗ"),
+        ("ΟΣΙ", "ΟΣΣΙ"),
+        ("ΟΣΟ", "ΟΣΣΟ"),
+        ("ΟΣΥ", "ΟΣΣΥ"),
+        ("ΟΣΩ", "ΟΣΣΩ"),
+        ("ΥΣΑ", "ΥΣΣΑ"),
+        ("ΥΣΕ", "ΥΣΣΕ"),
+        ("ΥΣΗ", "ΥΣΣΗ"),
+        ("ΥΣΙ", "ΥΣΣΙ"),
+        ("ΥΣΟ", "ΥΣΣΟ"),
+        ("ΥΣΥ", "ΥΣΣΥ"),
+        ("ΥΣΩ", "ΥΣΣΩ"),
+        ("ΩΣΑ", "ΩΣΣΑ"),
+        ("ΩΣΕ", "ΩΣΣΕ"),
+        ("ΩΣΗ", "ΩΣΣΗ"),
+        ("ΩΣΙ", "ΩΣΣΙ"),
+        ("ΩΣΟ", "ΩΣΣΟ"),
+        ("ΩΣΥ", "ΩΣΣΥ"),
+        ("ΩΣΩ", "ΩΣΣΩ"),
+        ("ΕΥΒ", "EV"),
+        ("ΕΥΔ", "EVD"),
+        ("ΕΥΜ", "EVM"),
+        ("ΕΥΓ", "EVG"),
+        ("ΕΥΗ", "EVI"),
+        ("ΕΥΑ", "EVA"),
+        ("ΕΥΜ", "EVM"),
+        ("ΕΥΛ", "EVL"),
+        ("ΕΥΝ", "EVN"),
+        ("ΕΥΟ", "EVO"),
+        ("ΕΥΡ", "EVR"),
+        ("ΕΥΕ", "EVE"),
+        ("ΑΥΔ", "AYD"),
+        ("ΑΥΜ", "AVM"),
+        ("ΑΥΓ", "AVG"),
+        ("ΑΥΗ", "AVI"),
+        ("ΑΥΑ", "AVA"),
+        ("ΑΥΜ", "AVM"),
+        ("ΑΥΛ", "AVL"),
+        ("ΑΥΝ", "AVN"),
+        ("ΑΥΟ", "AVO"),
+        ("ΑΥΡ", "AVR"),
+        ("ΑΥΕ", "AVE"),
+        ("ΓΓ", "G"),
+        ("ΓΚ", "G"),
+        ("ΜΠ", "B"),
+        ("ΝΤ", "D"),
+        ("ΟΥ", "OU"),
+        ("ΟΙ", "I"),
+        ("ΥΙ", "I"),
+        ("ΕΙ", "I"),
+        ("ΑΙ", "E"),
+        ("ΑΥ", "AF"),
+        ("ΕΥΗ", "EVI"),
+        ("ΕΥ", "EF"),
+        ("Χ", "CH"),
+        ("Ψ", "PS"),
+        ("Θ", "TH"),
+        ("Ά", "A"),
+        ("Α", "A"),
+        ("Β", "V"),
+        ("Γ", "G"),
+        ("Δ", "D"),
+        ("Ε", "E"),
+        ("Έ", "E"),
+        ("Ζ", "Z"),
+        ("Η", "I"),
+        ("Ή", "I"),
+        ("Ι", "I"),
+        ("Ί", "I"),
+        ("Κ", "K"),
+        ("Λ", "L"),
+        ("Μ", "M"),
+        ("Ν", "N"),
+        ("Ξ", "X"),
+        ("Ο", "O"),
+        ("Π", "P"),
+        ("Ρ", "R"),
+        ("Σ", "S"),
+        ("Τ", "T"),
+        ("Ύ", "I"),
+        ("Υ", "I"),
+        ("Φ", "F"),
+        ("Ω", "O"),
+        ("Ώ", "O"),
+    ]
+
     def __init__(
         self,
         input_str: str,
@@ -16,6 +478,7 @@ class ReplaceClass:
         convert_to_voice_eq: bool,
     ):
         self.input_str = input_str
+        self.word_separable = None
 
         if not (convert_to_elot or convert_to_voice_eq):
             print(
@@ -28,406 +491,7 @@ class ReplaceClass:
                 else ("replacements_normalize_string_Eng", "Voice_equivalent")
             )
 
-        self.replacements_normalize_string = [
-            ("ΟΥ", "U"),
-            ("ΟΙ", "Ι"),
-            ("ΥΙ", "Ι"),
-            ("ΕΙ", "Ι"),
-            ("ΑΙ", "Ε"),
-            ("Η", "Ι"),
-            ("Υ", "Ι"),
-            ("Ω", "Ο"),
-            ("Ά", "Α"),
-            ("Έ", "Ε"),
-            ("Ί", "Ι"),
-            ("Ϊ", "Ι"),
-        ]
-
-        self.replacements_normalize_string_EngELOT743_lower = [
-            ("άι", "α$$"),
-            ("όι", "ο$$"),
-            ("έι", "ε$$"),
-            ("ά", "α"),
-            ("έ", "ε"),
-            ("ΐ", "ϊ"),
-            ("αϊ", "ai"),
-            ("αΐ", "ai"),
-            ("εϊ", "ei"),
-            ("εΐ", "ei"),
-            ("οϊ", "oi"),
-            ("οΐ", "oi"),
-            ("οϋ", "oi"),
-            ("οΰ", "oi"),
-            ("ϊ", "υ"),
-            ("ΰ", "υ"),
-            ("ί", "ι"),
-            ("ή", "η"),
-            ("ό", "ο"),
-            ("ώ", "ω"),
-            ("ύ", "υ"),
-            ("ϋ", "υ"),
-            ("ΰ", "υ"),
-            ("$$", "ι"),
-        ]
-
-        self.replacements_normalize_string_EngELOT743_upper = [
-            ("ΑΥΑ", "AVΑ"),
-            ("ΑΥΒ", "AV"),
-            ("ΑΥΓ", "AVΓ"),
-            ("ΑΥΔ", "AVΔ"),
-            ("ΑΥΕ", "AVΕ"),
-            ("ΑΥΖ", "AVΖ"),
-            ("ΑΥΗ", "AVΗ"),
-            ("ΑΥΙ", "AVΙ"),
-            ("ΑΥΛ", "AVΛ"),
-            ("ΑΥΜ", "AVΜ"),
-            ("ΑΥΝ", "AVΝ"),
-            ("ΑΥΡ", "AVΡ"),
-            ("ΑΥΟ", "AVΟ"),
-            ("ΑΥΥ", "AVΥ"),
-            ("ΑΥΩ", "AVΩ"),
-            ("ΑΥΘ", "AFΘ"),
-            ("ΑΥΚ", "AFΚ"),
-            ("ΑΥΞ", "AFΞ"),
-            ("ΑΥΠ", "AFΠ"),
-            ("ΑΥΣ", "AFΣ"),
-            ("ΑΥΤ", "AFΤ"),
-            ("ΑΥΦ", "AFΦ"),
-            ("ΑΥΧ", "AFΧ"),
-            ("ΑΥΨ", "AFΨ"),
-            ("ΑΥ ", "AF "),
-            ("ΕΥΑ", "EVΑ"),
-            ("ΕΥΒ", "EV"),
-            ("ΕΥΓ", "EVΓ"),
-            ("ΕΥΔ", "EVΔ"),
-            ("ΕΥΕ", "EVΕ"),
-            ("ΕΥΖ", "EVΖ"),
-            ("ΕΥΗ", "EVΗ"),
-            ("ΕΥΙ", "EVΙ"),
-            ("ΕΥΛ", "EVΛ"),
-            ("ΕΥΜ", "EVΜ"),
-            ("ΕΥΝ", "EVΝ"),
-            ("ΕΥΡ", "EVΡ"),
-            ("ΕΥΟ", "EVΟ"),
-            ("ΕΥΥ", "EVΥ"),
-            ("ΕΥΩ", "EVΩ"),
-            ("ΕΥΘ", "EFΘ"),
-            ("ΕΥΚ", "EFΚ"),
-            ("ΕΥΞ", "EFΞ"),
-            ("ΕΥΠ", "EFΠ"),
-            ("ΕΥΣ", "EFΣ"),
-            ("ΕΥΤ", "EFΤ"),
-            ("ΕΥΦ", "EFΦ"),
-            ("ΕΥΧ", "EFΧ"),
-            ("ΕΥΨ", "EFΨ"),
-            ("ΕΥ ", "EF "),
-            ("ΗΥΑ", "IVΑ"),
-            ("ΗΥΒ", "IV"),
-            ("ΗΥΓ", "IVΓ"),
-            ("ΗΥΔ", "IVΔ"),
-            ("ΗΥΕ", "IVΕ"),
-            ("ΗΥΖ", "IVΖ"),
-            ("ΗΥΗ", "IVΗ"),
-            ("ΗΥΙ", "IVΙ"),
-            ("ΗΥΛ", "IVΛ"),
-            ("ΗΥΜ", "IVΜ"),
-            ("ΗΥΝ", "IVΝ"),
-            ("ΗΥΡ", "IVΡ"),
-            ("ΗΥΟ", "IVΟ"),
-            ("ΗΥΥ", "IVΥ"),
-            ("ΗΥΩ", "IVΩ"),
-            ("ΗΥΘ", "IFΘ"),
-            ("ΗΥΚ", "IFΚ"),
-            ("ΗΥΞ", "IFΞ"),
-            ("ΗΥΠ", "IFΠ"),
-            ("ΗΥΣ", "IFΣ"),
-            ("ΗΥΤ", "IFΤ"),
-            ("ΗΥΦ", "IFΦ"),
-            ("ΗΥΧ", "IFΧ"),
-            ("ΗΥΨ", "IFΨ"),
-            ("ΗΥ ", "IF "),
-            (" ΜΠ", " B"),
-            ("ΓΓ", "NG"),
-            ("ΓΞ", "NX"),
-            ("ΓΧ", "NCH"),
-            ("ΟΥ", "OU"),
-            ("Χ", "CH"),
-            ("Ψ", "PS"),
-            ("Θ", "TH"),
-            ("Ά", "A"),
-            ("Α", "A"),
-            ("Β", "V"),
-            ("Γ", "G"),
-            ("Δ", "D"),
-            ("Ε", "E"),
-            ("Έ", "E"),
-            ("Ζ", "Z"),
-            ("Η", "I"),
-            ("Ή", "I"),
-            ("Ι", "I"),
-            ("Ί", "I"),
-            ("Κ", "K"),
-            ("Λ", "L"),
-            ("Μ", "M"),
-            ("Ν", "N"),
-            ("Ξ", "X"),
-            ("Ο", "O"),
-            ("Π", "P"),
-            ("Ρ", "R"),
-            ("Σ", "S"),
-            ("Τ", "T"),
-            ("Ύ", "Y"),
-            ("Υ", "Y"),
-            ("Φ", "F"),
-            ("Ω", "O"),
-            ("Ώ", "O"),
-        ]
-
-        self.replacements_normalize_string_Eng_lower = [
-            ("άι", "α$$"),
-            ("όι", "ο$$"),
-            ("έι", "ε$$"),
-            ("ά", "α"),
-            ("έ", "ε"),
-            ("ΐ", "ϊ"),
-            ("αϊ", "ai"),
-            ("αΐ", "ai"),
-            ("εϊ", "ei"),
-            ("εΐ", "ei"),
-            ("οϊ", "oi"),
-            ("οΐ", "oi"),
-            ("οϋ", "oi"),
-            ("οΰ", "oi"),
-            ("ϊ", "υ"),
-            ("ΰ", "υ"),
-            ("ί", "ι"),
-            ("ή", "η"),
-            ("ό", "ο"),
-            ("ώ", "ω"),
-            ("ύ", "υ"),
-            ("ϋ", "υ"),
-            ("ΰ", "υ"),
-            ("$$", "ι"),
-        ]
-
-        self.replacements_normalize_string_Eng_upper = [
-            ("ΑΥΣΑ", "ΑΥSΑ"),
-            ("ΑΥΣΕ", "ΑΥSΕ"),
-            ("ΑΥΣΙ", "ΑΥSΙ"),
-            ("ΑΥΣΗ", "ΑΥSΗ"),
-            ("ΑΥΣΟ", "ΑΥSΟ"),
-            ("ΑΥΣΥ", "ΑΥSΥ"),
-            ("ΑΥΣΩ", "ΑΥSΩ"),
-            ("ΕΥΣΑ", "ΕΥSΑ"),
-            ("ΕΥΣΕ", "ΕΥSΕ"),
-            ("ΕΥΣΙ", "ΕΥSΙ"),
-            ("ΕΥΣΗ", "ΕΥSΗ"),
-            ("ΕΥΣΟ", "ΕΥSΟ"),
-            ("ΕΥΣΥ", "ΕΥSΥ"),
-            ("ΕΥΣΩ", "ΕΥSΩ"),
-            ("ΕΙΣΑ", "ΕΙΣΣΑ"),
-            ("ΕΙΣΕ", "ΕΙΣΣΕ"),
-            ("ΕΙΣΙ", "ΕΙΣΣΙ"),
-            ("ΕΙΣΗ", "ΕΙΣΣΗ"),
-            ("ΕΙΣΟ", "ΕΙΣΣΟ"),
-            ("ΕΙΣΥ", "ΕΙΣΣΥ"),
-            ("ΕΙΣΩ", "ΕΙΣΣΩ"),
-            ("ΥΙΣΑ", "ΥΙΣΣΑ"),
-            ("ΥΙΣΕ", "ΥΙΣΣΕ"),
-            ("ΥΙΣΙ", "ΥΙΣΣΙ"),
-            ("ΥΙΣΗ", "ΥΙΣΣΗ"),
-            ("ΥΙΣΟ", "ΥΙΣΣΟ"),
-            ("ΥΙΣΥ", "ΥΙΣΣΥ"),
-            ("ΥΙΣΩ", "ΥΙΣΣΩ"),
-            ("ΑΙΣΑ", "ΑΙΣΣΑ"),
-            ("ΑΙΣΕ", "ΑΙΣΣΕ"),
-            ("ΑΙΣΙ", "ΑΙΣΣΙ"),
-            ("ΑΙΣΗ", "ΑΙΣΣΗ"),
-            ("ΑΙΣΟ", "ΑΙΣΣΟ"),
-            ("ΑΙΣΥ", "ΑΙΣΣΥ"),
-            ("ΑΙΣΩ", "ΑΙΣΣΩ"),
-            ("ΟΙΣΑ", "ΟΙΣΣΑ"),
-            ("ΟΙΣΕ", "ΟΙΣΣΕ"),
-            ("ΟΙΣΙ", "ΟΙΣΣΙ"),
-            ("ΟΙΣΗ", "ΟΙΣΣΗ"),
-            ("ΟΙΣΟ", "ΟΙΣΣΟ"),
-            ("ΟΙΣΥ", "ΟΙΣΣΥ"),
-            ("ΟΙΣΩ", "ΟΙΣΣΩ"),
-            ("ΟΥΣΑ", "ΟΥΣΣΑ"),
-            ("ΟΥΣΕ", "ΟΥΣΣΕ"),
-            ("ΟΥΣΙ", "ΟΥΣΣΙ"),
-            ("ΟΥΣΗ", "ΟΥΣΣΗ"),
-            ("ΟΥΣΟ", "ΟΥΣΣΟ"),
-            ("ΟΥΣΥ", "ΟΥΣΣΥ"),
-            ("ΟΥΣΩ", "ΟΥΣΣΩ"),
-            ("ΑΣΥΙ", "ΑΣΣΥΙ"),
-            ("ΕΣΥΙ", "ΕΣΣΥΙ"),
-            ("ΙΣΥΙ", "ΙΣΣΥΙ"),
-            ("ΗΣΥΙ", "ΗΣΣΥΙ"),
-            ("ΟΣΥΙ", "ΟΣΣΥΙ"),
-            ("ΥΣΥΙ", "ΥΣΣΥΙ"),
-            ("ΩΣΥΙ", "ΩΣΣΥΙ"),
-            ("ΑΣΑΙ", "ΑΣΣΑΙ"),
-            ("ΕΣΑΙ", "ΕΣΣΑΙ"),
-            ("ΙΣΑΙ", "ΙΣΣΑΙ"),
-            ("ΗΣΑΙ", "ΗΣΣΑΙ"),
-            ("ΟΣΑΙ", "ΟΣΣΑΙ"),
-            ("ΥΣΑΙ", "ΥΣΣΑΙ"),
-            ("ΩΣΑΙ", "ΩΣΣΑΙ"),
-            ("ΑΣΟΙ", "ΑΣΣΟΙ"),
-            ("ΕΣΟΙ", "ΕΣΣΟΙ"),
-            ("ΙΣΟΙ", "ΙΣΣΟΙ"),
-            ("ΗΣΟΙ", "ΗΣΣΟΙ"),
-            ("ΟΣΟΙ", "ΟΣΣΟΙ"),
-            ("ΥΣΟΙ", "ΥΣΣΟΙ"),
-            ("ΩΣΟΙ", "ΩΣΣΟΙ"),
-            ("ΑΣΟΥ", "ΑΣΣΟΥ"),
-            ("ΕΣΟΥ", "ΕΣΣΟΥ"),
-            ("ΙΣΟΥ", "ΙΣΣΟΥ"),
-            ("ΗΣΟΥ", "ΗΣΣΟΥ"),
-            ("ΟΣΟΥ", "ΟΣΣΟΥ"),
-            ("ΥΣΟΥ", "ΥΣΣΟΥ"),
-            ("ΩΣΟΥ", "ΩΣΣΟΥ"),
-            ("ΑΣΕΥ", "ΑΣΣΕΥ"),
-            ("ΕΣΕΥ", "ΕΣΣΕΥ"),
-            ("ΙΣΕΥ", "ΙΣΣΕΥ"),
-            ("ΗΣΕΥ", "ΗΣΣΕΥ"),
-            ("ΟΣΕΥ", "ΟΣΣΕΥ"),
-            ("ΥΣΕΥ", "ΥΣΣΕΥ"),
-            ("ΩΣΕΥ", "ΩΣΣΕΥ"),
-            ("ΑΣΑΥ", "ΑΣΣΑΥ"),
-            ("ΕΣΑΥ", "ΕΣΣΑΥ"),
-            ("ΙΣΑΥ", "ΙΣΣΑΥ"),
-            ("ΗΣΑΥ", "ΗΣΣΑΥ"),
-            ("ΟΣΑΥ", "ΟΣΣΑΥ"),
-            ("ΥΣΑΥ", "ΥΣΣΑΥ"),
-            ("ΩΣΑΥ", "ΩΣΣΑΥ"),
-            ("ΑΣΕΙ", "ΑΣΣΕΙ"),
-            ("ΕΣΕΙ", "ΕΣΣΕΙ"),
-            ("ΙΣΕΙ", "ΙΣΣΕΙ"),
-            ("ΗΣΕΙ", "ΗΣΣΕΙ"),
-            ("ΟΣΕΙ", "ΟΣΣΕΙ"),
-            ("ΥΣΕΙ", "ΥΣΣΕΙ"),
-            ("ΩΣΕΙ", "ΩΣΣΕΙ"),
-            ("ΑΣΑ", "ΑΣΣΑ"),
-            ("ΑΣΕ", "ΑΣΣΕ"),
-            ("ΑΣΗ", "ΑΣΣΗ"),
-            ("ΑΣΙ", "ΑΣΣΙ"),
-            ("ΑΣΟ", "ΑΣΣΟ"),
-            ("ΑΣΥ", "ΑΣΣΥ"),
-            ("ΑΣΩ", "ΑΣΣΩ"),
-            ("ΕΣΑ", "ΕΣΣΑ"),
-            ("ΕΣΕ", "ΕΣΣΕ"),
-            ("ΕΣΗ", "ΕΣΣΗ"),
-            ("ΕΣΙ", "ΕΣΣΙ"),
-            ("ΕΣΟ", "ΕΣΣΟ"),
-            ("ΕΣΥ", "ΕΣΣΥ"),
-            ("ΕΣΩ", "ΕΣΣΩ"),
-            ("ΗΣΑ", "ΕΣΣΑ"),
-            ("ΗΣΕ", "ΕΣΣΕ"),
-            ("ΗΣΗ", "ΕΣΣΗ"),
-            ("ΗΣΙ", "ΗΣΣΙ"),
-            ("ΗΣΙ", "ΕΣΣΙ"),
-            ("ΗΣΟ", "ΗΣΣΟ"),
-            ("ΗΣΟ", "ΕΣΣΟ"),
-            ("ΗΣΥ", "ΕΣΣΥ"),
-            ("ΗΣΩ", "ΕΣΣΩ"),
-            ("ΙΣΑ", "IΣΣΑ"),
-            ("ΙΣΕ", "IΣΣΕ"),
-            ("ΙΣΗ", "IΣΣΗ"),
-            ("ΙΣΙ", "IΣΣΙ"),
-            ("ΙΣΟ", "IΣΣΟ"),
-            ("ΙΣΥ", "IΣΣΥ"),
-            ("ΙΣΩ", "IΣΣΩ"),
-            ("ΟΣΑ", "ΟΣΣΑ"),
-            ("ΟΣΕ", "ΟΣΣΕ"),
-            ("ΟΣΗ", "ΟΣΣΗ"),
-            ("ΟΣΙ", "ΟΣΣΙ"),
-            ("ΟΣΟ", "ΟΣΣΟ"),
-            ("ΟΣΥ", "ΟΣΣΥ"),
-            ("ΟΣΩ", "ΟΣΣΩ"),
-            ("ΥΣΑ", "ΥΣΣΑ"),
-            ("ΥΣΕ", "ΥΣΣΕ"),
-            ("ΥΣΗ", "ΥΣΣΗ"),
-            ("ΥΣΙ", "ΥΣΣΙ"),
-            ("ΥΣΟ", "ΥΣΣΟ"),
-            ("ΥΣΥ", "ΥΣΣΥ"),
-            ("ΥΣΩ", "ΥΣΣΩ"),
-            ("ΩΣΑ", "ΩΣΣΑ"),
-            ("ΩΣΕ", "ΩΣΣΕ"),
-            ("ΩΣΗ", "ΩΣΣΗ"),
-            ("ΩΣΙ", "ΩΣΣΙ"),
-            ("ΩΣΟ", "ΩΣΣΟ"),
-            ("ΩΣΥ", "ΩΣΣΥ"),
-            ("ΩΣΩ", "ΩΣΣΩ"),
-            ("ΕΥΒ", "EV"),
-            ("ΕΥΔ", "EVD"),
-            ("ΕΥΜ", "EVM"),
-            ("ΕΥΓ", "EVG"),
-            ("ΕΥΗ", "EVI"),
-            ("ΕΥΑ", "EVA"),
-            ("ΕΥΜ", "EVM"),
-            ("ΕΥΛ", "EVL"),
-            ("ΕΥΝ", "EVN"),
-            ("ΕΥΟ", "EVO"),
-            ("ΕΥΡ", "EVR"),
-            ("ΕΥΕ", "EVE"),
-            ("ΑΥΔ", "AYD"),
-            ("ΑΥΜ", "AVM"),
-            ("ΑΥΓ", "AVG"),
-            ("ΑΥΗ", "AVI"),
-            ("ΑΥΑ", "AVA"),
-            ("ΑΥΜ", "AVM"),
-            ("ΑΥΛ", "AVL"),
-            ("ΑΥΝ", "AVN"),
-            ("ΑΥΟ", "AVO"),
-            ("ΑΥΡ", "AVR"),
-            ("ΑΥΕ", "AVE"),
-            ("ΓΓ", "G"),
-            ("ΓΚ", "G"),
-            ("ΜΠ", "B"),
-            ("ΝΤ", "D"),
-            ("ΟΥ", "OU"),
-            ("ΟΙ", "I"),
-            ("ΥΙ", "I"),
-            ("ΕΙ", "I"),
-            ("ΑΙ", "E"),
-            ("ΑΥ", "AF"),
-            ("ΕΥΗ", "EVI"),
-            ("ΕΥ", "EF"),
-            ("Χ", "CH"),
-            ("Ψ", "PS"),
-            ("Θ", "TH"),
-            ("Ά", "A"),
-            ("Α", "A"),
-            ("Β", "V"),
-            ("Γ", "G"),
-            ("Δ", "D"),
-            ("Ε", "E"),
-            ("Έ", "E"),
-            ("Ζ", "Z"),
-            ("Η", "I"),
-            ("Ή", "I"),
-            ("Ι", "I"),
-            ("Ί", "I"),
-            ("Κ", "K"),
-            ("Λ", "L"),
-            ("Μ", "M"),
-            ("Ν", "N"),
-            ("Ξ", "X"),
-            ("Ο", "O"),
-            ("Π", "P"),
-            ("Ρ", "R"),
-            ("Σ", "S"),
-            ("Τ", "T"),
-            ("Ύ", "I"),
-            ("Υ", "I"),
-            ("Φ", "F"),
-            ("Ω", "O"),
-            ("Ώ", "O"),
-        ]
-
-    def search_and_replace_normalize(self, input_str) -> str:
+    def normalize_sequential(self, input_str) -> str:
         """
         Normalize the input string by performing a series of search and replace operations
         using specified replacement groups for lowercase and uppercase transformations.
@@ -474,6 +538,92 @@ class ReplaceClass:
             # Print any error encountered during execution
             print(error)
 
+    def is_word_separable(self) -> bool:
+        """
+        Checks whether the '_lower' and '_upper' replacement groups keep the word boundaries,
+        so that the input string can be normalized word by word.
+
+        Returns:
+        - bool: True if every replacement rule of the groups keeps the word boundaries.
+        """
+        if self.word_separable is None:
+            self.word_separable = rules_are_word_separable(
+                tuple(getattr(self, self.replacement_group + "_lower"))
+                + tuple(getattr(self, self.replacement_group + "_upper"))
+            )
+        return self.word_separable
+
+    def search_and_replace_normalize(self, input_str) -> str:
+        """
+        Normalize the input string with the same result as `normalize_sequential`.
+
+        When no replacement rule can move the spaces of the string, the string is split on spaces
+        and every word is normalized once, together with its neighbouring spaces, so that rules like
+        ("ΑΥ ", "AF ") still see them. Normalized words are kept in a cache shared by all instances
+        with the same replacement group, so repeated street and municipality names are not processed again.
+
+        Parameters:
+        - input_str (str): The string to be normalized.
+
+        Returns:
+        - str: The normalized string after applying the search and replace transformations.
+        """
+        try:
+            # If the input string is empty, return an empty string
+            if input_str == "":
+                return ""
+
+            # Fall back to the whole string when a rule can span over a space
+            if not self.is_word_separable():
+                return self.normalize_sequential(input_str)
+
+            word_cache = word_caches.setdefault(self.replacement_group, {})
+            words = input_str.split(" ")
+            last_index = len(words) - 1
+
+            normalized_words = []
+            for index, word in enumerate(words):
+                # A word is normalized together with the spaces that surround it in the input string
+                has_leading_space, has_trailing_space = index > 0, index < last_index
+                cache_key = (word, has_leading_space, has_trailing_space)
+
+                normalized_word = word_cache.get(cache_key)
+                if normalized_word is None:
+                    padded_word = " " * has_leading_space + word + " " * has_trailing_space
+                    normalized_word = self.normalize_sequential(padded_word)
+                    normalized_word = normalized_word[has_leading_space:len(normalized_word) - has_trailing_space]
+
+                    # Reset the cache instead of letting it grow without bound
+                    if len(word_cache) >= WORD_CACHE_SIZE:
+                        word_cache.clear()
+                    word_cache[cache_key] = normalized_word
+
+                normalized_words.append(normalized_word)
+
+            return " ".join(normalized_words)
+        except Exception as error:
+            # Print any error encountered during execution
+            print(error)
+
+    def find_mismatches(self, input_strs: list) -> list:
+        """
+        Compares `search_and_replace_normalize` with the reference `normalize_sequential`.
+
+        Parameters:
+        - input_strs (list): The strings to be checked.
+
+        Returns:
+        - list: A list of (input, sequential output, word by word output) tuples for every string
+          where the two outputs differ. An empty list means that the outputs are identical.
+        """
+        mismatches = []
+        for input_str in input_strs:
+            sequential_str = self.normalize_sequential(input_str)
+            normalized_str = self.search_and_replace_normalize(input_str)
+            if sequential_str != normalized_str:
+                mismatches.append((input_str, sequential_str, normalized_str))
+        return mismatches
+
     def replace_to_latin(self) -> None:
         """
         Replace the content of the input string with normalized text
@@ -531,6 +681,65 @@ def main(
         print(main_error)
 
 
+def main_batch(
+    input_strs,
+    convert_to_elot: bool = True,
+    convert_to_voice_eq: bool = True,
+) -> pd.DataFrame:
+    """
+    Batch function to normalize a column of input strings in one call.
+
+    The process includes:
+    1. Converting the input (pandas Series, list or pyarrow string array) to a pandas Series.
+    2. Factorizing the Series, so that every distinct string is normalized only once.
+    3. Normalizing the distinct strings with one ReplaceClass per requested output.
+    4. Mapping the normalized strings back to the rows of the input.
+
+    Parameters:
+    - input_strs (pd.Series | list | pyarrow.Array | pyarrow.ChunkedArray): Input strings to be processed.
+    - convert_to_elot (bool): Flag to add the 'ELOT' output column.
+    - convert_to_voice_eq (bool): Flag to add the 'Voice_equivalent' output column.
+
+    Returns:
+    - pd.DataFrame: One column per requested output ('ELOT', 'Voice_equivalent'), aligned with the
+      input rows. Missing input values stay missing.
+    """
+    try:
+        # Convert the input to a pandas Series, keeping the index of an input Series
+        if isinstance(input_strs, pd.Series):
+            input_series = input_strs
+        elif hasattr(input_strs, "to_pandas"):
+            input_series = input_strs.to_pandas()
+        else:
+            input_series = pd.Series(list(input_strs), dtype=object)
+
+        # Factorize the input, codes point to the distinct strings and missing values get the code -1
+        codes, distinct_strs = pd.factorize(input_series)
+
+        # Create one ReplaceClass per requested output, the replacement tables are shared
+        replace_classes = []
+        if convert_to_elot:
+            replace_classes.append(ReplaceClass(None, True, False))
+        if convert_to_voice_eq:
+            replace_classes.append(ReplaceClass(None, False, True))
+
+        output_df = pd.DataFrame(index=input_series.index)
+        for replace_class in replace_classes:
+            # Normalize every distinct string once, with a trailing slot for the missing values
+            normalized_strs = pd.array(
+                [replace_class.search_and_replace_normalize(str(value)) for value in distinct_strs] + [None],
+                dtype=object,
+            )
+
+            # Map the normalized strings back to the input rows
+            output_df[replace_class.column_name] = normalized_strs[codes]
+
+        return output_df
+    except Exception as main_error:
+        # Print any error encountered during execution
+        print(main_error)
+
+
 if __name__ == "__main__":
     try:
         kwargs = {
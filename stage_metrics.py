@@ -0,0 +1,286 @@
+try:
+    import functools
+    import json
+    import os
+    import threading
+    import time
+    import pandas as pd
+except ImportError as import_err:
+    print(import_err)
+
+# psutil and resource are optional: without them the resident memory is read from /proc (Linux) or left empty
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def read_memory_status() -> dict:
+    """
+    Reads the resident memory of the process and its peak (since the start, or the last `reset_peak_rss`),
+    in bytes, from /proc/self/status (Linux), psutil or `resource.getrusage`. Missing values are None.
+    """
+    status = {"rss": None, "peak_rss": None}
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    status["rss"] = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    status["peak_rss"] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    if status["rss"] is None and psutil is not None:
+        status["rss"] = psutil.Process().memory_info().rss
+    if status["peak_rss"] is None and resource is not None:
+        # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        status["peak_rss"] = max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+    return status
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident memory of the process to its current value (Linux only). The reset applies to the
+    whole process, so it also clears the peak seen by any other code that reads it.
+
+    Returns:
+        bool: Whether the peak was reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def count_rows(value):
+    """
+    Returns the number of rows of a DataFrame or Series, or None for any other value.
+    """
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+class StageMetrics:
+    """
+    Records the wall time, the peak resident memory and the input/output rows of the stages of a run.
+
+    Every stage gives one record:
+    - stage, depth (stages called by other stages are nested), pid, start (seconds since the metrics were created)
+    - wall_seconds
+    - rss_start, rss_end and peak_rss_delta: the growth of the peak resident memory of the process during the
+      stage, in bytes (0 if the stage stayed below an earlier peak); with `reset_peak=True` the peak is reset at
+      the start of every stage (Linux only) and the delta is the peak of the stage above `rss_start`
+    - rows_in, rows_out
+    - error: the exception that left the stage, or was caught by it (see `record_error`), if any
+
+    The records are exported with `to_json` or, for chrome://tracing / Perfetto, with `to_chrome_trace`.
+    """
+
+    def __init__(self, enabled: bool = True, reset_peak: bool = False):
+        self.enabled = enabled
+        self.reset_peak = reset_peak
+        self.records = []
+        # The durations are measured with perf_counter; the wall clock time of the origin lines up the records
+        # of other processes (see `merge`)
+        self.origin = time.perf_counter()
+        self.origin_time = time.time()
+        self.local = threading.local()
+
+    def start_stage(self, stage: str, rows_in) -> dict:
+        stack = self.local.__dict__.setdefault("stack", [])
+        memory = read_memory_status()
+        frame = {
+            "stage": stage,
+            "depth": len(stack),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "start": time.perf_counter() - self.origin,
+            "rss_start": memory["rss"],
+            "rows_in": rows_in,
+            "peak_reset": self.reset_peak and reset_peak_rss(),
+            "peak_rss": memory["peak_rss"],
+            "children_peak_rss": None,
+            "error": None,
+        }
+        stack.append(frame)
+        return frame
+
+    def record_error(self, error: Exception) -> None:
+        """
+        Records the error of the running stage. The stage methods catch their errors and print them, so they call
+        this method in their `except` block; otherwise the failed stage would be recorded as a success.
+        """
+        stack = self.local.__dict__.get("stack")
+        if stack:
+            stack[-1]["error"] = error
+
+    def end_stage(self, frame: dict, rows_out, error: Exception = None) -> None:
+        error = error or frame["error"]
+        stack = self.local.stack
+        stack.remove(frame)
+        memory = read_memory_status()
+
+        # With reset_peak a nested stage resets the peak, so the peaks of the nested stages are carried to their parent
+        peak_values = [value for value in [memory["peak_rss"], frame["children_peak_rss"], memory["rss"]]
+                       if value is not None]
+        peak_rss = max(peak_values) if peak_values else None
+        if stack and peak_rss is not None:
+            parent = stack[-1]
+            parent["children_peak_rss"] = max(parent["children_peak_rss"] or 0, peak_rss)
+
+        if frame["peak_reset"]:
+            peak_rss_delta = None if peak_rss is None or frame["rss_start"] is None else peak_rss - frame["rss_start"]
+        elif memory["peak_rss"] is None or frame["peak_rss"] is None:
+            peak_rss_delta = None
+        else:
+            peak_rss_delta = memory["peak_rss"] - frame["peak_rss"]
+
+        self.records.append({
+            "stage": frame["stage"],
+            "depth": frame["depth"],
+            "pid": frame["pid"],
+            "tid": frame["tid"],
+            "start": round(frame["start"], 6),
+            "wall_seconds": round(time.perf_counter() - self.origin - frame["start"], 6),
+            "rss_start": frame["rss_start"],
+            "rss_end": memory["rss"],
+            "peak_rss_delta": peak_rss_delta,
+            "rows_in": frame["rows_in"],
+            "rows_out": rows_out,
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+        })
+
+    def merge(self, records: list, origin_time: float) -> None:
+        """
+        Adds the records of another StageMetrics, e.g. of a worker process, as stages nested in the running stage.
+
+        Parameters:
+            records (list): The records of the other StageMetrics.
+            origin_time (float): The `origin_time` of the other StageMetrics, to shift its start times to this one.
+        """
+        stack = self.local.__dict__.get("stack") or []
+        offset = origin_time - self.origin_time
+        for record in records:
+            self.records.append({**record, "depth": record["depth"] + len(stack),
+                                 "start": round(record["start"] + offset, 6)})
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns the records as a DataFrame, in the order the stages ended.
+        """
+        return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns the calls, total wall time, maximum peak memory delta and total rows of every stage,
+        the slowest stage first.
+        """
+        records_df = self.to_dataframe()
+        if records_df.empty:
+            return records_df
+        return (records_df.groupby("stage", sort=False)
+                .agg(calls=("stage", "size"), wall_seconds=("wall_seconds", "sum"),
+                     peak_rss_delta=("peak_rss_delta", "max"), rows_in=("rows_in", "sum"),
+                     rows_out=("rows_out", "sum"))
+                .sort_values("wall_seconds", ascending=False))
+
+    def to_json(self, file_path: str = None) -> str:
+        """
+        Exports the records as JSON, and writes them to `file_path` if it is given.
+        """
+        metrics_json = json.dumps({"records": self.records}, indent=2)
+        if file_path is not None:
+            with open(file_path, "w", encoding="utf-8") as file:
+                file.write(metrics_json)
+        return metrics_json
+
+    def to_chrome_trace(self, file_path: str = None) -> dict:
+        """
+        Exports the records in the Chrome trace event format (complete 'X' events, with the rows and memory
+        of every stage in their arguments, and a 'C' counter of the resident memory), and writes them to
+        `file_path` if it is given. The file opens in chrome://tracing or https://ui.perfetto.dev.
+        """
+        trace_events = []
+        for record in self.records:
+            trace_events.append({
+                "name": record["stage"],
+                "cat": "preprocessing",
+                "ph": "X",
+                "ts": round(record["start"] * 1e6, 3),
+                "dur": round(record["wall_seconds"] * 1e6, 3),
+                "pid": record["pid"],
+                "tid": record["tid"],
+                "args": {key: record[key] for key in ["rows_in", "rows_out", "rss_start", "rss_end",
+                                                      "peak_rss_delta", "error"]},
+            })
+            if record["rss_end"] is not None:
+                trace_events.append({
+                    "name": "rss",
+                    "ph": "C",
+                    "ts": round((record["start"] + record["wall_seconds"]) * 1e6, 3),
+                    "pid": record["pid"],
+                    "args": {"rss_mb": round(record["rss_end"] / 2 ** 20, 3)},
+                })
+
+        trace = {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+        if file_path is not None:
+            with open(file_path, "w", encoding="utf-8") as file:
+                json.dump(trace, file)
+        return trace
+
+    def clear(self) -> None:
+        """
+        Removes the records.
+        """
+        self.records = []
+
+
+def instrumented_stage(rows_in_attribute: str = None, rows_out_attribute: str = None):
+    """
+    Decorator of the stage methods of PreprocessingDataClass: records the stage in the `stage_metrics`
+    (a StageMetrics) of the instance.
+
+    The input rows are the rows of the first DataFrame argument, and the output rows those of the returned
+    DataFrame. Stages that work on the instance (e.g. `drop_columns`, `write_in_csv`) count the rows of its
+    attributes instead (e.g. "excel_df" or "filtered_df").
+
+    Parameters:
+        rows_in_attribute (str): The attribute whose rows are counted before the stage, if no DataFrame is given.
+        rows_out_attribute (str): The attribute whose rows are counted after the stage, if no DataFrame is
+                                  returned; `rows_in_attribute` by default.
+    """
+    rows_out_attribute = rows_out_attribute or rows_in_attribute
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stage_metrics = getattr(self, "stage_metrics", None)
+            if stage_metrics is None or not stage_metrics.enabled:
+                return method(self, *args, **kwargs)
+
+            rows_in = next((count_rows(arg) for arg in args if count_rows(arg) is not None), None)
+            if rows_in is None and rows_in_attribute is not None:
+                rows_in = count_rows(getattr(self, rows_in_attribute, None))
+
+            frame = stage_metrics.start_stage(method.__name__, rows_in)
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception as error:
+                stage_metrics.end_stage(frame, None, error)
+                raise
+
+            rows_out = count_rows(result)
+            if rows_out is None and rows_out_attribute is not None:
+                rows_out = count_rows(getattr(self, rows_out_attribute, None))
+            stage_metrics.end_stage(frame, rows_out)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,330 @@
+try:
+    import asyncio
+    import csv
+    import json
+    import os
+    import random
+    import time
+    import pandas as pd
+    import requests
+    from terra_client import TerraClient, TERRA_URL
+except ImportError as import_err:
+    print(import_err)
+
+
+# Columns of the results file: the first match of every address, flattened
+RESULT_COLUMNS = ["row_id", "input", "status", "error", "attempts", "n_matches",
+                  "addType", "addId", "addZip", "addStreet", "addNumb", "addMunicip",
+                  "addPoint_x", "addPoint_y", "addPointWGS84_x", "addPointWGS84_y", "addFormated"]
+
+
+def read_addresses(input_file: str, address_column: str, id_column: str = None, sep: str = ",") -> pd.DataFrame:
+    """
+    Reads the addresses to geocode from a CSV or Parquet file.
+
+    Parameters:
+        input_file (str): The path of the .csv or .parquet file.
+        address_column (str): The column with the addresses.
+        id_column (str): The column with the ids of the rows; the row number is used if it is not given.
+        sep (str): The separator of a .csv file.
+
+    Returns:
+        pd.DataFrame: A DataFrame with the columns "row_id" and "input" (empty for the missing addresses),
+                      in the order of the file.
+    """
+    if input_file.lower().endswith(".parquet"):
+        columns = [address_column] if id_column is None else [id_column, address_column]
+        input_df = pd.read_parquet(input_file, columns=columns)
+    else:
+        input_df = pd.read_csv(input_file, sep=sep, dtype=str, keep_default_na=False)
+
+    # Null cells (e.g. of a Parquet file) are empty addresses, not the strings "None" / "nan"
+    row_ids = input_df[id_column] if id_column is not None else pd.Series(range(len(input_df)))
+    addresses = input_df[address_column].fillna("").astype(str)
+    return pd.DataFrame({"row_id": row_ids.to_numpy(), "input": addresses.to_numpy()})
+
+
+def flatten_result(row_id, addr: str, address_list: list = None, error: Exception = None, attempts: int = 1) -> dict:
+    """
+    Flattens the first match of the service response into a row of the results file
+    (addPoint / addPointWGS84 are split into _x / _y columns).
+
+    Parameters:
+        row_id: The id of the row.
+        addr (str): The geocoded address.
+        address_list (list): The response of the service, or None if the request failed.
+        error (Exception): The error of the last attempt, if the request failed.
+        attempts (int): The number of requests made for the address (0 for an empty address).
+
+    Returns:
+        dict: The row, with the keys of RESULT_COLUMNS.
+    """
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update({"row_id": row_id, "input": addr, "attempts": attempts})
+
+    if error is not None:
+        row.update({"status": "error", "error": f"{type(error).__name__}: {error}"})
+        return row
+
+    address_list = address_list or []
+    row.update({"status": "ok" if address_list else "not_found", "n_matches": len(address_list)})
+    if address_list:
+        match = address_list[0]
+        for key in ["addType", "addId", "addZip", "addStreet", "addNumb", "addMunicip", "addFormated"]:
+            row[key] = match.get(key)
+        for key in ["addPoint", "addPointWGS84"]:
+            point = match.get(key) or {}
+            row[key + "_x"] = point.get("x")
+            row[key + "_y"] = point.get("y")
+    return row
+
+
+class RateLimiter:
+    """
+    Spaces the start of the requests to at most `rate` requests per second (no limit if rate is None).
+    """
+
+    def __init__(self, rate: float = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Tells whether a failed request is worth retrying: connection errors, timeouts, and HTTP 429 / 5xx responses.
+    Permanent failures (e.g. a 4xx response or a malformed body) are not retried.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+async def geocode_with_retries(client: TerraClient, row_id, addr: str, semaphore: asyncio.Semaphore,
+                               rate_limiter: RateLimiter, max_retries: int, backoff: float) -> dict:
+    """
+    Geocodes one address, retrying transient failures (see is_transient_error) with exponential backoff (and jitter).
+
+    The semaphore is held only during the requests, so an address waiting for its retry does not take a
+    concurrency slot from the others. An empty address is "not_found" without a request.
+
+    Returns:
+        dict: The flattened result (see flatten_result); after a permanent failure, or max_retries failed retries,
+              the status is "error".
+    """
+    if not addr.strip():
+        return flatten_result(row_id, addr, [], attempts=0)
+
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore:
+                await rate_limiter.wait()
+                address_list = await client.geocode_async(addr)
+            return flatten_result(row_id, addr, address_list, attempts=attempt + 1)
+        except Exception as error:
+            if attempt == max_retries or not is_transient_error(error):
+                return flatten_result(row_id, addr, error=error, attempts=attempt + 1)
+        await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+def input_signature(input_file: str, address_column: str, rows: int) -> dict:
+    """
+    Identifies the input of a run (path, size, modification time, address column and number of rows), so that a
+    checkpoint is resumed only for the input it was written for.
+    """
+    stat = os.stat(input_file)
+    return {"input_file": os.path.abspath(input_file), "size": stat.st_size, "mtime": stat.st_mtime,
+            "address_column": address_column, "rows": rows}
+
+
+def load_checkpoint(checkpoint_file: str) -> dict:
+    """
+    Loads the checkpoint of a previous run, or returns an empty checkpoint.
+    """
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, encoding="utf-8") as file:
+            return json.load(file)
+    return {"completed_rows": 0, "output_size": 0}
+
+
+def save_checkpoint(checkpoint_file: str, checkpoint: dict) -> None:
+    """
+    Saves the checkpoint atomically (temporary file and replace), so a crash never leaves it half written.
+    """
+    temporary_file = checkpoint_file + ".tmp"
+    with open(temporary_file, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_file, checkpoint_file)
+
+
+async def geocode_file_async(input_file: str,
+                             output_file: str,
+                             address_column: str,
+                             id_column: str = None,
+                             checkpoint_file: str = None,
+                             client: TerraClient = None,
+                             concurrency: int = 8,
+                             rate_limit: float = None,
+                             max_retries: int = 3,
+                             backoff: float = 1.0,
+                             batch_size: int = 500,
+                             sep: str = ",") -> dict:
+    """
+    Async implementation of geocode_file (see there).
+    """
+    addresses = read_addresses(input_file, address_column, id_column, sep)
+    checkpoint_file = checkpoint_file or output_file + ".checkpoint.json"
+
+    # Resume: drop whatever was written after the last checkpoint and skip the completed rows, unless the input
+    # changed since the checkpoint (its rows would be skipped or misaligned), in which case the run starts over
+    signature = input_signature(input_file, address_column, len(addresses))
+    checkpoint = load_checkpoint(checkpoint_file)
+    if checkpoint["completed_rows"] and checkpoint.get("input") != signature:
+        print(f"'{input_file}' changed since the checkpoint, geocoding all the addresses again")
+        checkpoint = {"completed_rows": 0, "output_size": 0}
+    if os.path.exists(output_file):
+        with open(output_file, "r+b") as file:
+            file.truncate(checkpoint["output_size"])
+    else:
+        checkpoint = {"completed_rows": 0, "output_size": 0}
+
+    # A client created here is closed at the end (a given client is left open for the caller)
+    own_client = client is None
+    client = client or TerraClient(pool_size=max(concurrency, 1))
+    try:
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        rate_limiter = RateLimiter(rate_limit)
+        summary = {"rows": len(addresses), "skipped": checkpoint["completed_rows"], "ok": 0, "not_found": 0, "error": 0}
+
+        for start in range(checkpoint["completed_rows"], len(addresses), batch_size):
+            batch = addresses.iloc[start:start + batch_size]
+            results = await asyncio.gather(*[
+                geocode_with_retries(client, row_id, addr, semaphore, rate_limiter, max_retries, backoff)
+                for row_id, addr in zip(batch["row_id"], batch["input"])])
+
+            # Append the results of the batch, then record the checkpoint
+            with open(output_file, "a", encoding="utf-8", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS, delimiter=";")
+                if file.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(results)
+                file.flush()
+                os.fsync(file.fileno())
+                checkpoint = {"completed_rows": start + len(batch), "output_size": file.tell(), "input": signature}
+            save_checkpoint(checkpoint_file, checkpoint)
+
+            for result in results:
+                summary[result["status"]] += 1
+            print(f"Geocoded {checkpoint['completed_rows']}/{len(addresses)} addresses")
+
+        return summary
+    finally:
+        if own_client:
+            client.close()
+
+
+def geocode_file(input_file: str,
+                 output_file: str,
+                 address_column: str,
+                 id_column: str = None,
+                 checkpoint_file: str = None,
+                 client: TerraClient = None,
+                 concurrency: int = 8,
+                 rate_limit: float = None,
+                 max_retries: int = 3,
+                 backoff: float = 1.0,
+                 batch_size: int = 500,
+                 sep: str = ",") -> dict:
+    """
+    Geocodes all the addresses of a CSV or Parquet file with the Terra geocoding service.
+
+    The requests are sent concurrently (at most `concurrency` in flight and at most `rate_limit` per second) and
+    transient failures (connection errors, timeouts, HTTP 429 / 5xx) are retried with exponential backoff.
+    The results are appended to `output_file` (a ';' separated CSV with the RESULT_COLUMNS) batch by batch,
+    and a checkpoint file records the completed rows, so running the function again after a crash continues
+    from the last completed batch. If the input file changed since the checkpoint, all the addresses are
+    geocoded again.
+
+    Parameters:
+        input_file (str): The .csv or .parquet file with the addresses.
+        output_file (str): The .csv file of the results.
+        address_column (str): The column with the addresses.
+        id_column (str): The column with the ids of the rows; the row number is used if it is not given.
+        checkpoint_file (str): The checkpoint file; '<output_file>.checkpoint.json' by default.
+        client (TerraClient): The client to use; a new client of the default service url by default.
+        concurrency (int): The maximum number of concurrent requests.
+        rate_limit (float): The maximum number of requests per second, or None for no limit.
+        max_retries (int): The number of retries of a failed request.
+        backoff (float): The base delay of the retries, in seconds (doubled on every retry).
+        batch_size (int): The number of addresses written (and checkpointed) at a time.
+        sep (str): The separator of a .csv input file.
+
+    Returns:
+        dict: The number of rows, of rows skipped because they were completed by a previous run,
+              and of "ok", "not_found" and "error" results.
+    """
+    return asyncio.run(geocode_file_async(input_file, output_file, address_column, id_column, checkpoint_file,
+                                          client, concurrency, rate_limit, max_retries, backoff, batch_size, sep))
+
+
+def main(input_file: str, output_file: str, address_column: str, id_column: str = None, url: str = TERRA_URL,
+         cache_path: str = None, concurrency: int = 8, rate_limit: float = None, max_retries: int = 3) -> None:
+    """
+    Main function to geocode a file of addresses.
+
+    Parameters:
+    - input_file (str): The .csv or .parquet file with the addresses.
+    - output_file (str): The .csv file of the results (and '<output_file>.checkpoint.json' of the checkpoint).
+    - address_column (str): The column with the addresses.
+    - id_column (str): The column with the ids of the rows, or None to use the row numbers.
+    - url (str): The url of the geocoding service.
+    - cache_path (str): The path of the response cache, or None for no cache.
+    - concurrency (int): The maximum number of concurrent requests.
+    - rate_limit (float): The maximum number of requests per second, or None for no limit.
+    - max_retries (int): The number of retries of a failed request.
+
+    Returns:
+    - None: The function writes the results to files, but does not return any value.
+    """
+    try:
+        print(f"Geocoding '{input_file}'...")
+        client = TerraClient(url, pool_size=max(concurrency, 1), cache_path=cache_path)
+        try:
+            summary = geocode_file(input_file, output_file, address_column, id_column, client=client,
+                                   concurrency=concurrency, rate_limit=rate_limit, max_retries=max_retries)
+        finally:
+            client.close()
+        print(summary)
+    except Exception as main_error:
+        print(main_error)
+
+
+if __name__ == '__main__':
+    try:
+        kwargs = {
+            "input_file": "addresses.csv",  # Set the .csv or .parquet file with the addresses
+            "output_file": "geocoded.csv",  # Set the .csv file of the results
+            "address_column": "full_address",  # Set the column with the addresses
+            "id_column": None,  # Set the column with the row ids (None: row numbers)
+            "cache_path": None,  # Set the path of the response cache (None: no cache)
+            "concurrency": 8,  # Set the maximum number of concurrent requests
+            "rate_limit": 20,  # Set the maximum number of requests per second
+            "max_retries": 3,  # Set the number of retries of a failed request
+        }
+        main(**kwargs)
+    except Exception as error:
+        print(error)
@@ -0,0 +1,292 @@
+try:
+    import asyncio
+    import json
+    import os
+    import sqlite3
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from requests.adapters import HTTPAdapter
+    from dl_functions import strip_accents_and_lowercase
+except ImportError as import_err:
+    print(import_err)
+
+
+TERRA_URL = "http://mapsrv9.terra.gr/avl/webservice.asmx/getAddressJSON"
+
+
+def normalize_cache_key(addr: str) -> str:
+    """
+    Normalizes an address for the response cache: strips the accents, lowercases and collapses the whitespace,
+    so that 'Καραϊσκάκη  32, Πάτρα' and 'καραισκακη 32, πατρα' share the same cache entry.
+
+    Parameters:
+        addr (str): The address as given to the geocoding service.
+
+    Returns:
+        str: The normalized address.
+    """
+    # The accents are stripped through the shared normalization cache of dl_functions
+    return " ".join(strip_accents_and_lowercase(addr).split())
+
+
+def parse_terra_response(text: str) -> list:
+    """
+    Extracts the JSON list of addresses from the XML envelope of the service
+    (<?xml ...?><string xmlns="...">[...]</string>).
+
+    Parameters:
+        text (str): The body of the response.
+
+    Returns:
+        list: The list of the matched addresses.
+    """
+    start = text.find("<string")
+    end = text.rfind("</string>")
+    if start < 0 or end < 0:
+        # Plain JSON body
+        return json.loads(text)
+    return json.loads(text[text.find(">", start) + 1:end])
+
+
+class ResponseCache:
+    """
+    A persistent (SQLite) cache of the geocoding responses, keyed by the service and the normalized input
+    (see `TerraClient.cache_key`).
+
+    Entries older than `ttl` seconds are ignored and deleted, and when the cache holds more than `max_entries`
+    entries the oldest ones are evicted. The cache can be shared between threads.
+    """
+
+    def __init__(self, cache_path: str, ttl: float = 30 * 24 * 3600, max_entries: int = 1000000, prune_every: int = 1000):
+        """
+        Parameters:
+            cache_path (str): The path of the SQLite file (created if it does not exist).
+            ttl (float): The time to live of an entry, in seconds.
+            max_entries (int): The maximum number of entries kept in the cache.
+            prune_every (int): The expired and oldest entries are deleted every `prune_every` writes.
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        cache_folder = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_folder, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses "
+                                "(cache_key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self.connection.commit()
+
+    def get(self, cache_key: str):
+        """
+        Returns the cached response of a key, or None if the key is missing or expired.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT response, created FROM responses WHERE cache_key = ?",
+                                          (cache_key,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, cache_key: str, response: list) -> None:
+        """
+        Stores the response of a key.
+        """
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses (cache_key, response, created) VALUES (?, ?, ?)",
+                                    (cache_key, json.dumps(response, ensure_ascii=False), time.time()))
+            self.connection.commit()
+            self.writes += 1
+            if self.writes % self.prune_every == 0:
+                self.prune_locked()
+
+    def prune(self) -> None:
+        """
+        Deletes the expired entries and evicts the oldest entries above `max_entries`.
+        """
+        with self.lock:
+            self.prune_locked()
+
+    def prune_locked(self) -> None:
+        self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self.connection.execute("DELETE FROM responses WHERE cache_key IN "
+                                "(SELECT cache_key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                                (self.max_entries,))
+        self.connection.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns the hits, misses and number of entries of the cache.
+        """
+        with self.lock:
+            size = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "size": size}
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+class TerraClient:
+    """
+    A shared client of the Terra geocoding service (getAddressJSON).
+
+    - One requests.Session with a keep-alive connection pool is reused by all the requests.
+    - geocode_many / geocode_many_async fan out the requests with asyncio, bounded by `concurrency`.
+    - With `cache_path`, the responses are kept in a persistent ResponseCache keyed by the url, countryCode and
+      SRID of the client and the normalized input, so clients of other services can share the cache file.
+
+    The service url is configurable, so the client can be pointed to a local stub server.
+    """
+
+    def __init__(self,
+                 url: str = TERRA_URL,
+                 country_code: str = "30",
+                 srid: str = "2100",
+                 timeout: float = 30,
+                 pool_size: int = 16,
+                 cache_path: str = None,
+                 cache_ttl: float = 30 * 24 * 3600,
+                 cache_max_entries: int = 1000000):
+        """
+        Parameters:
+            url (str): The url of the getAddressJSON method.
+            country_code (str): The countryCode parameter of the service.
+            srid (str): The SRID of the returned coordinates.
+            timeout (float): The timeout of a request, in seconds.
+            pool_size (int): The number of kept-alive connections (and of the threads of the async variant).
+            cache_path (str): The path of the response cache, or None for no cache.
+            cache_ttl (float): The time to live of a cached response, in seconds.
+            cache_max_entries (int): The maximum number of cached responses.
+        """
+        self.url = url
+        self.country_code = country_code
+        self.srid = srid
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.cache = ResponseCache(cache_path, cache_ttl, cache_max_entries) if cache_path else None
+        self.executor = None
+        self.executor_lock = threading.Lock()
+
+    def request(self, addr: str) -> list:
+        """
+        Sends one request to the service (no cache).
+        """
+        params = {"countryCode": self.country_code, "input": addr, "SRID": self.srid}
+        resp = self.session.get(self.url, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        return parse_terra_response(resp.text)
+
+    def cache_key(self, addr: str) -> str:
+        """
+        Returns the cache key of an address: the url, countryCode and SRID of the request and the normalized address,
+        so that a service (or a projection) is never given the cached response of another.
+        """
+        return "\n".join([self.url, str(self.country_code), str(self.srid), normalize_cache_key(addr)])
+
+    def geocode(self, addr: str) -> list:
+        """
+        Geocodes one address.
+
+        Parameters:
+            addr (str): The address, e.g. 'Καραϊσκάκη 32, 26221, Πάτρα'.
+
+        Returns:
+            list: The matched addresses (dicts with addZip, addStreet, addPoint, ...), as returned by the service.
+        """
+        if self.cache is None:
+            return self.request(addr)
+
+        cache_key = self.cache_key(addr)
+        address_list = self.cache.get(cache_key)
+        if address_list is None:
+            address_list = self.request(addr)
+            self.cache.put(cache_key, address_list)
+        return address_list
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.pool_size)
+            return self.executor
+
+    async def geocode_async(self, addr: str) -> list:
+        """
+        Geocodes one address without blocking the event loop (the request runs on the client's thread pool).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.get_executor(), self.geocode, addr)
+
+    async def geocode_many_async(self, addrs: list, concurrency: int = 8, return_exceptions: bool = False) -> list:
+        """
+        Geocodes many addresses concurrently, with at most `concurrency` requests in flight.
+
+        Parameters:
+            addrs (list): The addresses.
+            concurrency (int): The maximum number of concurrent requests (capped by `pool_size`).
+            return_exceptions (bool): If True, a failed address gives its exception instead of failing the batch.
+
+        Returns:
+            list: The results, in the order of `addrs`.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def bounded_geocode(addr):
+            async with semaphore:
+                return await self.geocode_async(addr)
+
+        return await asyncio.gather(*[bounded_geocode(addr) for addr in addrs], return_exceptions=return_exceptions)
+
+    def geocode_many(self, addrs: list, concurrency: int = 8, return_exceptions: bool = False) -> list:
+        """
+        Synchronous wrapper of geocode_many_async (must not be called from a running event loop).
+        """
+        return asyncio.run(self.geocode_many_async(addrs, concurrency, return_exceptions))
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+# Shared clients, one per service url
+shared_clients = {}
+shared_clients_lock = threading.Lock()
+
+
+def get_terra_client(url: str = TERRA_URL, **kwargs) -> TerraClient:
+    """
+    Returns the shared client of a service url, creating it on the first call.
+
+    Parameters:
+        url (str): The url of the getAddressJSON method.
+        **kwargs: The TerraClient arguments, used only when the client is created
+                  (e.g. cache_path; the TERRA_CACHE_PATH environment variable is used by default).
+
+    Returns:
+        TerraClient: The shared client.
+    """
+    with shared_clients_lock:
+        if url not in shared_clients:
+            kwargs.setdefault("cache_path", os.environ.get("TERRA_CACHE_PATH"))
+            shared_clients[url] = TerraClient(url, **kwargs)
+        return shared_clients[url]